@@ -0,0 +1,149 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "server"))
+
+from protocol.tunnel_protocol import FrameProtocol, FrameWriter, PackageType, ProtocolError, HEADER, HEADER_SIZE, MAX_CONNECTION_ID, pack_header, pack_package, unpack_package
+
+SIZES = [0, 64, 1024, 16384, 65536]
+
+
+def rate(count: int, started: float) -> int:
+    return round(count / (time.perf_counter() - started))
+
+def header_validated(payload: bytes, count: int) -> int:
+    size = len(payload)
+    started = time.perf_counter()
+    for connection_id in range(1, count + 1):
+        pack_header(PackageType.DATA, connection_id, size, max(size, 1))
+    return rate(count, started)
+
+def header_trusted(payload: bytes, count: int) -> int:
+    size = len(payload)
+    frames = FrameWriter(None, max_payload_size=max(size, 1))
+    started = time.perf_counter()
+    for connection_id in range(1, count + 1):
+        frames.header(PackageType.DATA, connection_id, size)
+    return rate(count, started)
+
+def encode_validated(payload: bytes, count: int) -> int:
+    started = time.perf_counter()
+    for connection_id in range(1, count + 1):
+        pack_package(PackageType.DATA, connection_id, payload)
+    return rate(count, started)
+
+def encode_frame_writer(payload: bytes, count: int) -> int:
+    frames = FrameWriter(None, max_payload_size=max(len(payload), 1), queue_size=count + 1)
+    started = time.perf_counter()
+    for connection_id in range(1, count + 1):
+        frames.send(PackageType.DATA, connection_id, payload)
+    return rate(count, started)
+
+async def decode_stream(payload: bytes, count: int) -> int:
+    reader = asyncio.StreamReader(limit=2 ** 30)
+    reader.feed_data(pack_package(PackageType.DATA, 1, payload) * count)
+    reader.feed_eof()
+
+    started = time.perf_counter()
+    for _ in range(count):
+        await unpack_package(reader)
+    return rate(count, started)
+
+async def decode_protocol(payload: bytes, count: int) -> int:
+    received = 0
+
+    def frame_received(package_type: int, connection_id: int, data: memoryview) -> None:
+        nonlocal received
+        received += 1
+
+    protocol = FrameProtocol(frame_received)
+    data = memoryview(pack_package(PackageType.DATA, 1, payload) * count)
+
+    started = time.perf_counter()
+    position = 0
+    while position < len(data):
+        buffer = protocol.get_buffer(-1)
+        size = min(len(buffer), len(data) - position)
+        buffer[:size] = data[position:position + size]
+        protocol.buffer_updated(size)
+        position += size
+
+    if received != count:
+        raise RuntimeError(f"Decoded {received} of {count} frames")
+    return rate(count, started)
+
+def random_frame(generator: random.Random) -> bytes:
+    package_type = generator.choice([generator.randrange(256), *PackageType])
+    connection_id = generator.choice([0, 1, MAX_CONNECTION_ID, MAX_CONNECTION_ID + 1, generator.randrange(2 ** 32)])
+    payload = generator.randbytes(generator.choice([0, 1, 64, 4096]))
+    length = len(payload) if generator.random() < 0.9 else generator.randrange(2 ** 32)
+    return HEADER.pack(package_type, connection_id, length) + payload
+
+async def fuzz(count: int, seed: int) -> Dict[str, int]:
+    generator = random.Random(seed)
+    accepted = rejected = 0
+
+    for _ in range(count):
+        frame = random_frame(generator)
+        reader = asyncio.StreamReader()
+        reader.feed_data(frame)
+        reader.feed_eof()
+
+        try:
+            package_type, connection_id, payload = await unpack_package(reader)
+        except ProtocolError:
+            rejected += 1
+            continue
+
+        if pack_package(package_type, connection_id, payload) != frame:
+            raise RuntimeError(f"Round trip mismatch for frame {frame[:HEADER_SIZE].hex()}")
+        accepted += 1
+
+    return {"accepted": accepted, "rejected": rejected}
+
+async def run(count: int, sizes: List[int], seed: int) -> Dict[str, Dict[str, int]]:
+    results: Dict[str, Dict[str, int]] = {}
+    benchmarks: Dict[str, Callable] = {"header_validated": header_validated, "header_trusted": header_trusted, "encode_validated": encode_validated, "encode_frame_writer": encode_frame_writer, "decode_stream": decode_stream, "decode_protocol": decode_protocol}
+
+    for size in sizes:
+        payload = os.urandom(size)
+        frames = min(count, max(1000, 2 ** 28 // (HEADER_SIZE + size)))
+        results[str(size)] = {}
+        for name, benchmark in benchmarks.items():
+            result = benchmark(payload, frames)
+            results[str(size)][name] = await result if asyncio.iscoroutine(result) else result
+
+    results["fuzz"] = await fuzz(count // 10, seed)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure frame encode and decode rates of the tunnel protocol codec")
+    parser.add_argument("--count", type=int, default=200000, help="frames per measurement")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="payload sizes in bytes")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the fuzzed round trip check")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    arguments = parser.parse_args()
+
+    results = asyncio.run(run(arguments.count, arguments.sizes, arguments.seed))
+    if arguments.json:
+        print(json.dumps(results, indent=4))
+        return
+
+    fuzzed = results.pop("fuzz")
+    names = list(next(iter(results.values())))
+    print(f"{"payload":>8} " + " ".join(f"{name:>20}" for name in names) + "   frames/s")
+    for size, rates in results.items():
+        print(f"{size:>8} " + " ".join(f"{rates[name]:>20,}" for name in names))
+    print(f"fuzz: {fuzzed["accepted"]} frames round-tripped, {fuzzed["rejected"]} rejected")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "server"))
+
+from protocol.tunnel_protocol import install_event_loop, describe_event_loop
+
+
+async def echo(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    while data := await reader.read(65536):
+        writer.write(data)
+        await writer.drain()
+    writer.close()
+
+async def pump(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while data := await reader.read(65536):
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionResetError, OSError):
+        pass
+    finally:
+        writer.close()
+
+async def relay(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, port: int) -> None:
+    target_reader, target_writer = await asyncio.open_connection("127.0.0.1", port)
+    await asyncio.gather(pump(reader, target_writer), pump(target_reader, writer))
+
+async def round_trips(port: int, duration: float) -> float:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    count = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        writer.write(b"x" * 64)
+        await reader.readexactly(64)
+        count += 1
+
+    writer.close()
+    return count / duration
+
+async def bulk(port: int, duration: float) -> float:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    chunk = b"x" * 65536
+    received = 0
+
+    async def send():
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            writer.write(chunk)
+            await writer.drain()
+        writer.write_eof()
+
+    sender = asyncio.create_task(send())
+    while data := await reader.read(262144):
+        received += len(data)
+
+    await sender
+    writer.close()
+    return received / duration / 1_000_000
+
+async def run(duration: float, connections: int) -> dict:
+    echo_server = await asyncio.start_server(echo, "127.0.0.1", 0)
+    echo_port = echo_server.sockets[0].getsockname()[1]
+    relay_server = await asyncio.start_server(lambda r, w: relay(r, w, echo_port), "127.0.0.1", 0)
+    relay_port = relay_server.sockets[0].getsockname()[1]
+
+    async with echo_server, relay_server:
+        return {
+            "event_loop": describe_event_loop(),
+            "round_trips_per_second": round(await round_trips(relay_port, duration)),
+            "bulk_mb_per_second": round(sum(await asyncio.gather(*(bulk(relay_port, duration) for _ in range(connections)))), 1)
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare relay throughput across event loop implementations")
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--loop", choices=["asyncio", "uvloop"], help="run a single event loop in this process")
+    arguments = parser.parse_args()
+
+    if arguments.loop:
+        install_event_loop(arguments.loop)
+        print(json.dumps(asyncio.run(run(arguments.duration, arguments.connections))))
+        return
+
+    results = []
+    for loop in ("asyncio", "uvloop"):
+        process = subprocess.run([sys.executable, __file__, "--loop", loop, "--duration", str(arguments.duration), "--connections", str(arguments.connections)], capture_output=True, text=True)
+        if process.returncode != 0:
+            print(f"{loop}: unavailable ({process.stderr.strip().splitlines()[-1]})")
+            continue
+
+        results.append(json.loads(process.stdout))
+
+    for result in results:
+        print(f"{result["event_loop"]:<32} {result["round_trips_per_second"]:>10} rt/s {result["bulk_mb_per_second"]:>10} MB/s")
+
+
+if __name__ == "__main__":
+    main()
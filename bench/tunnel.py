@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import signal
+import socket
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "server"))
+
+from config.config import load_config
+from config.types import Config
+from logger.logger import setup_logging
+from ports.pool import PortPool
+from protocol.tunnel_protocol import install_event_loop, describe_event_loop
+from server.server import start_server, shutdown as server_shutdown
+
+METRICS = {
+    "bulk_mb_per_second": True,
+    "latency_p50_ms": False,
+    "latency_p99_ms": False,
+    "setups_per_second": True,
+    "setup_p50_ms": False,
+    "setup_p99_ms": False,
+    "max_concurrent_visitors": True
+}
+
+
+def parse_override(value: str) -> Tuple[str, List[str], Any]:
+    path, separator, raw = value.partition("=")
+    target, *keys = path.split(".")
+    if not separator or target not in ("server", "client") or not keys:
+        raise argparse.ArgumentTypeError("override must be in server.key=value or client.key=value form")
+
+    try:
+        return target, keys, json.loads(raw)
+    except json.JSONDecodeError:
+        return target, keys, raw
+
+def apply_override(config: Dict[str, Any], keys: List[str], value: Any) -> None:
+    for key in keys[:-1]:
+        config = config.setdefault(key, {})
+    config[keys[-1]] = value
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 3) if ordered else 0.0
+
+def raise_file_limit() -> None:
+    if resource is None:
+        return
+
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    try:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ValueError, OSError):
+        pass
+
+
+async def serve(config: Config) -> None:
+    shutdown_event = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, shutdown_event.set)
+
+    try:
+        await start_server(config, shutdown_event, asyncio.Lock(), {}, PortPool(config["allowed_port_range"], config["ports"]["cooldown"], config["ports"]["reservation"]))
+    finally:
+        await server_shutdown(asyncio.get_running_loop())
+
+async def echo(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while data := await reader.read(65536):
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionResetError, OSError):
+        pass
+    finally:
+        writer.close()
+
+async def probe(port: int) -> bool:
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    except OSError:
+        return False
+
+    try:
+        writer.write(b"x")
+        await asyncio.wait_for(reader.readexactly(1), timeout=1.0)
+        return True
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, OSError):
+        return False
+    finally:
+        writer.close()
+
+async def wait_for(check, timeout: float, message: str) -> None:
+    deadline = time.perf_counter() + timeout
+    while not await check():
+        if time.perf_counter() > deadline:
+            raise RuntimeError(message)
+        await asyncio.sleep(0.1)
+
+async def listening(port: int) -> bool:
+    try:
+        _, writer = await asyncio.open_connection("127.0.0.1", port)
+    except OSError:
+        return False
+
+    writer.close()
+    return True
+
+@asynccontextmanager
+async def tunnel(directory: Path, overrides: List[Tuple[str, List[str], Any]], echo_port: int, verbose: bool = False) -> AsyncIterator[int]:
+    control_port, remote_port = free_port(), free_port()
+
+    server_config = json.loads((ROOT / "server" / "config.json").read_text())
+    server_config.update({"host": "127.0.0.1", "port": control_port, "workers": 1, "allowed_port_range": [remote_port, remote_port], "accounts": [{"login": "bench", "password": "bench"}], "logging": {"level": "WARNING", "file": str(directory / "server.log")}})
+    client_config = json.loads((ROOT / "client" / "config.json").read_text())
+    client_config.update({"targets": [], "logging": {"level": "WARNING", "file": str(directory / "client.log")}})
+
+    for target, keys, value in overrides:
+        apply_override(server_config if target == "server" else client_config, keys, value)
+
+    (directory / "server.json").write_text(json.dumps(server_config))
+    (directory / "client.json").write_text(json.dumps(client_config))
+
+    output = None if verbose else asyncio.subprocess.DEVNULL
+    processes = [await asyncio.create_subprocess_exec(sys.executable, __file__, "--serve", str(directory / "server.json"), stdout=output, stderr=output)]
+    try:
+        await wait_for(lambda: listening(control_port), 10.0, "Server did not start")
+        processes.append(await asyncio.create_subprocess_exec(sys.executable, str(ROOT / "client" / "headless.py"), "--server", f"127.0.0.1:{control_port}", "--local-port", str(echo_port), "--username", "bench", "--password", "bench", "--config", str(directory / "client.json"), stdout=output, stderr=output))
+        await wait_for(lambda: probe(remote_port), 15.0, "Tunnel did not come up")
+        yield remote_port
+    finally:
+        for process in reversed(processes):
+            if process.returncode is None:
+                process.terminate()
+                await process.wait()
+
+async def bulk(port: int, duration: float, connections: int) -> float:
+    chunk = os.urandom(65536)
+
+    async def transfer() -> int:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        sent = received = 0
+
+        async def send():
+            nonlocal sent
+            deadline = time.perf_counter() + duration
+            while time.perf_counter() < deadline:
+                writer.write(chunk)
+                await writer.drain()
+                sent += len(chunk)
+
+        sender = asyncio.create_task(send())
+        try:
+            while not sender.done() or received < sent:
+                data = await asyncio.wait_for(reader.read(262144), timeout=10.0)
+                if not data:
+                    raise RuntimeError("Tunnel closed a bulk transfer")
+                received += len(data)
+        finally:
+            sender.cancel()
+            writer.close()
+
+        return received
+
+    started = time.perf_counter()
+    received = sum(await asyncio.gather(*(transfer() for _ in range(connections))))
+    return received / (time.perf_counter() - started) / 1_000_000
+
+async def round_trips(port: int, duration: float) -> List[float]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = b"x" * 64
+    samples = []
+
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        writer.write(payload)
+        await reader.readexactly(len(payload))
+        samples.append(time.perf_counter() - started)
+
+    writer.close()
+    return samples
+
+async def setups(port: int, duration: float, concurrency: int) -> List[float]:
+    samples = []
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"x")
+            await reader.readexactly(1)
+            samples.append(time.perf_counter() - started)
+            writer.close()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+async def max_visitors(port: int, limit: int, step: int) -> int:
+    writers = []
+
+    async def visit():
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writers.append(writer)
+        writer.write(b"x")
+        await asyncio.wait_for(reader.readexactly(1), timeout=5.0)
+
+    active = 0
+    try:
+        while active < limit:
+            results = await asyncio.gather(*(visit() for _ in range(min(step, limit - active))), return_exceptions=True)
+            active += sum(1 for result in results if not isinstance(result, BaseException))
+            if any(isinstance(result, BaseException) for result in results):
+                break
+    finally:
+        for writer in writers:
+            writer.close()
+
+    return active
+
+async def run(arguments: argparse.Namespace) -> Dict[str, Any]:
+    echo_server = await asyncio.start_server(echo, "127.0.0.1", 0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        async with echo_server, tunnel(Path(directory), arguments.set, echo_server.sockets[0].getsockname()[1], arguments.verbose) as port:
+            bulk_rate = await bulk(port, arguments.duration, arguments.connections)
+            latencies = await round_trips(port, arguments.duration)
+            setup_times = await setups(port, arguments.duration, arguments.concurrency)
+            visitors = await max_visitors(port, arguments.max_visitors, arguments.step)
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "event_loop": describe_event_loop(),
+        "overrides": {".".join([target] + keys): value for target, keys, value in arguments.set},
+        "metrics": {
+            "bulk_mb_per_second": round(bulk_rate, 1),
+            "latency_p50_ms": percentile(latencies, 0.5),
+            "latency_p99_ms": percentile(latencies, 0.99),
+            "setups_per_second": round(len(setup_times) / arguments.duration),
+            "setup_p50_ms": percentile(setup_times, 0.5),
+            "setup_p99_ms": percentile(setup_times, 0.99),
+            "max_concurrent_visitors": visitors
+        }
+    }
+
+def compare(current: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    regressions = []
+    for name, higher_is_better in METRICS.items():
+        if not baseline.get(name) or name not in current:
+            continue
+
+        change = (current[name] - baseline[name]) / baseline[name]
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<26} {baseline[name]:>10} {current[name]:>10} {change:>+8.1%}{"  REGRESSION" if regressed else ""}")
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure tunnel throughput, latency and connection handling end to end on localhost")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per timed measurement")
+    parser.add_argument("--connections", type=int, default=4, help="parallel bulk transfers")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel connection setups")
+    parser.add_argument("--max-visitors", type=int, default=1000, help="stop the concurrent visitor ramp at this count")
+    parser.add_argument("--step", type=int, default=100, help="visitors added per ramp step")
+    parser.add_argument("--set", type=parse_override, action="append", default=[], metavar="TARGET.KEY=VALUE", help="override a configuration value, e.g. server.limits.queue_size=500 or client.compression.enabled=false")
+    parser.add_argument("--loop", choices=["auto", "asyncio", "uvloop"], default="auto", help="event loop of the load generator")
+    parser.add_argument("--output", help="write results to this JSON file instead of stdout")
+    parser.add_argument("--baseline", help="compare against a stored result and exit non-zero on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change tolerated before flagging a regression")
+    parser.add_argument("--verbose", action="store_true", help="show server and client output")
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.serve:
+        config = load_config(arguments.serve)
+        setup_logging(config["logging"])
+        install_event_loop(config["event_loop"])
+        asyncio.run(serve(config))
+        return
+
+    raise_file_limit()
+    install_event_loop(arguments.loop)
+    results = asyncio.run(run(arguments))
+
+    if arguments.output:
+        Path(arguments.output).write_text(json.dumps(results, indent=4) + "\n")
+    else:
+        print(json.dumps(results, indent=4))
+
+    if arguments.baseline and compare(results["metrics"], json.loads(Path(arguments.baseline).read_text())["metrics"], arguments.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,8 @@ from typing import Dict, Any
 
 
 class ConfigurationManager:
-    def __init__(self):
-        self.config_path = Path("config.json")
+    def __init__(self, config_path: str = "config.json"):
+        self.config_path = Path(config_path)
         self.credentials_path = Path("credentials.json")
 
         self.config = self.load_config()
@@ -61,7 +61,30 @@ class ConfigurationManager:
           },
           "logging": {
             "file": "logs.txt",
-            "level": "INFO"
+            "level": "INFO",
+            "rate_limit": 20.0,
+            "burst": 100
+          },
+          "event_loop": "auto",
+          "compression": {
+            "enabled": False,
+            "level": 6
+          },
+          "sockets": {
+            "control": {"nodelay": True, "rcvbuf": 0, "sndbuf": 0},
+            "local": {"nodelay": True, "rcvbuf": 0, "sndbuf": 0}
+          },
+          "targets": [],
+          "lanes": 1,
+          "resume": True,
+          "local_pool": {
+            "enabled": False,
+            "max_size": 8,
+            "idle_timeout": 30.0
+          },
+          "ui": {
+            "refresh_rate": 4.0,
+            "max_log_lines": 200
           }
         }
 
@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+import getpass
+import os
+import signal
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from config_manager import ConfigurationManager
+from tunnel_protocol import install_event_loop, describe_event_loop
+from tunnel_client import TunnelClient
+
+
+def parse_server(value: str):
+    address, _, port = value.rpartition(":")
+    if not address or not port.isdigit():
+        raise argparse.ArgumentTypeError("server must be in host:port form")
+    return address, int(port)
+
+
+async def run(arguments: argparse.Namespace, config: dict, password: str) -> int:
+    client = TunnelClient(arguments.username, password, arguments.server[0], arguments.server[1], arguments.local_port, config)
+    await client.log(f"Using {describe_event_loop()} event loop.")
+
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, lambda: asyncio.ensure_future(client.stop()))
+        except (NotImplementedError, AttributeError):
+            pass
+
+    return 0 if await client.run() else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Nigarok headless tunnel client")
+    parser.add_argument("--server", type=parse_server, required=True, help="tunnel server as host:port")
+    parser.add_argument("--local-port", type=int, action="append", default=[], help="local port to expose, may be repeated")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", help="password, defaults to $NIGAROK_PASSWORD or an interactive prompt")
+    parser.add_argument("--config", default="config.json", help="client configuration file")
+    arguments = parser.parse_args()
+
+    config = ConfigurationManager(arguments.config).config
+    arguments.local_port += config.get("targets", [])
+    if not arguments.local_port:
+        parser.error("at least one --local-port or a targets entry in the configuration is required")
+    password = arguments.password or os.environ.get("NIGAROK_PASSWORD") or getpass.getpass("Password: ")
+
+    install_event_loop(config.get("event_loop", "auto"))
+    try:
+        sys.exit(asyncio.run(run(arguments, config, password)))
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
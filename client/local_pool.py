@@ -0,0 +1,108 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from tunnel_protocol import configure_socket
+
+
+class LocalConnectionPool:
+    def __init__(self, host: str, port: int, socket_options: Dict[str, Any], max_size: int = 8, idle_timeout: float = 30.0, rate_window: float = 10.0, horizon: float = 1.0, connect_timeout: float = 0.3):
+        self.host = host
+        self.port = port
+        self.socket_options = socket_options
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.rate_window = rate_window
+        self.horizon = horizon
+        self.connect_timeout = connect_timeout
+
+        self.idle: Deque[Tuple[float, asyncio.StreamReader, asyncio.StreamWriter]] = deque()
+        self.arrivals: Deque[float] = deque()
+        self.refill_task: Optional[asyncio.Task] = None
+        self.expiry: Optional[asyncio.TimerHandle] = None
+
+        self.hits = 0
+        self.misses = 0
+
+    async def connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), timeout=self.connect_timeout)
+        configure_socket(writer.get_extra_info("socket"), self.socket_options)
+        return reader, writer
+
+    def target_size(self, now: float) -> int:
+        while self.arrivals and self.arrivals[0] <= now - self.rate_window:
+            self.arrivals.popleft()
+
+        return min(self.max_size, math.ceil(len(self.arrivals) / self.rate_window * self.horizon))
+
+    def take(self, now: float) -> Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
+        while self.idle:
+            opened, reader, writer = self.idle.pop()
+            if now - opened < self.idle_timeout and not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+
+        return None
+
+    async def acquire(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        if not self.max_size:
+            return await self.connect()
+
+        now = time.monotonic()
+        self.arrivals.append(now)
+        connection = self.take(now)
+        self.schedule_refill()
+
+        if connection:
+            self.hits += 1
+            return connection
+
+        self.misses += 1
+        return await self.connect()
+
+    def schedule_refill(self) -> None:
+        if self.refill_task is None or self.refill_task.done():
+            self.refill_task = asyncio.create_task(self.refill())
+
+    def trim(self, now: float, target: int) -> None:
+        while self.idle and (len(self.idle) > target or now - self.idle[0][0] >= self.idle_timeout or self.idle[0][2].is_closing()):
+            self.idle.popleft()[2].close()
+
+    async def refill(self) -> None:
+        while True:
+            now = time.monotonic()
+            target = self.target_size(now)
+            self.trim(now, target)
+            if len(self.idle) >= target:
+                break
+
+            try:
+                reader, writer = await self.connect()
+            except (ConnectionRefusedError, asyncio.TimeoutError, OSError):
+                break
+
+            self.idle.append((time.monotonic(), reader, writer))
+
+        if self.expiry:
+            self.expiry.cancel()
+            self.expiry = None
+        if self.idle:
+            self.expiry = asyncio.get_running_loop().call_later(min(self.idle_timeout, self.rate_window), self.schedule_refill)
+
+    async def close(self) -> None:
+        if self.expiry:
+            self.expiry.cancel()
+            self.expiry = None
+        if self.refill_task and not self.refill_task.done():
+            self.refill_task.cancel()
+            await asyncio.gather(self.refill_task, return_exceptions=True)
+
+        while self.idle:
+            self.idle.pop()[2].close()
+
+        self.arrivals.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"idle": len(self.idle), "hits": self.hits, "misses": self.misses}
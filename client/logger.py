@@ -1,10 +1,17 @@
+import atexit
 import logging
+import queue
+from logging.handlers import QueueListener
+from typing import Optional
+
+from tunnel_protocol import DeferredQueueHandler, RateLimitFilter
 
 
 class Logger:
     _configured: bool = False
+    _listener: Optional[QueueListener] = None
 
-    def __init__(self, log_file: str, log_level: str):
+    def __init__(self, log_file: str, log_level: str, rate_limit: float = 20.0, burst: int = 100):
         self.logger = logging.getLogger("Nigarok")
 
         if not Logger._configured:
@@ -14,16 +21,22 @@ class Logger:
 
             file_handler = logging.FileHandler(log_file, encoding="utf-8")
             file_handler.setFormatter(logging.Formatter("[%(asctime)s] %(message)s", datefmt="%H:%M:%S"))
-            self.logger.addHandler(file_handler)
 
             console_handler = logging.StreamHandler()
             console_handler.setFormatter(logging.Formatter("[%(asctime)s] %(message)s", datefmt="%H:%M:%S"))
-            self.logger.addHandler(console_handler)
+
+            queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+            queue_handler.addFilter(RateLimitFilter(rate_limit, burst))
+            self.logger.addHandler(queue_handler)
+
+            Logger._listener = QueueListener(queue_handler.queue, file_handler, console_handler)
+            Logger._listener.start()
+            atexit.register(Logger._listener.stop)
 
             self.logger.propagate = False
 
             Logger._configured = True
 
-    async def log(self, message: str, level: str = "info"):
+    async def log(self, message: str, level: str = "info", *args, sampled: bool = False):
         logger_method = getattr(self.logger, level.lower(), self.logger.info)
-        logger_method(message)
+        logger_method(message, *args, extra={"sampled": True} if sampled else None)
@@ -5,11 +5,16 @@ from flet import Page, AppView
 from ui.login_window import LoginWindow
 from ui.theme_manager import ThemeManager
 from config_manager import ConfigurationManager
+from tunnel_protocol import install_event_loop, describe_event_loop
+from logger import Logger
 
 
 async def main(page: Page):
     configuration_manager = ConfigurationManager()
 
+    logger = Logger(configuration_manager.config["logging"]["file"], configuration_manager.config["logging"]["level"], configuration_manager.config["logging"].get("rate_limit", 20.0), configuration_manager.config["logging"].get("burst", 100))
+    await logger.log(f"Using {describe_event_loop()} event loop.")
+
     theme_manager = ThemeManager(page, configuration_manager)
     theme_manager.apply_theme()
 
@@ -17,4 +22,5 @@ async def main(page: Page):
     login_window.build()
 
 if __name__ == "__main__":
+    install_event_loop(ConfigurationManager().config.get("event_loop", "auto"))
     flet.app(target=lambda page: asyncio.run(main(page)), view=AppView.FLET_APP)
@@ -0,0 +1,551 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from local_pool import LocalConnectionPool
+from logger import Logger
+from tunnel_protocol import PackageType, Capability, FrameWriter, TunnelStream, StreamCompressor, StreamDecompressor, ReadSizer, DEFAULT_WINDOW_SIZE, DEFAULT_BATCH_SIZE, UNLIMITED_WINDOW, COMPRESSION_HEADROOM, client_handshake, client_join, client_resume, resume_entries, resume_streams, ReplayBuffer, configure_socket, unpack_package, unpack_new_connection, unpack_session, pack_window_update, unpack_window_update, ProtocolError, AuthenticationError
+
+
+class TunnelObserver:
+    def on_log(self, message: str, level: str) -> None:
+        pass
+
+    def on_address(self, address: Optional[str]) -> None:
+        pass
+
+    def on_traffic(self, upload: int, download: int) -> None:
+        pass
+
+    def on_ping(self, milliseconds: Optional[int]) -> None:
+        pass
+
+    async def on_stopped(self) -> None:
+        pass
+
+class TunnelClient:
+    def __init__(self, username: str, password: str, server_address: str, server_port: int, local_ports: List[int], config: Dict[str, Any], observer: Optional[TunnelObserver] = None):
+        self.username = username
+        self.password = password
+        self.server_address = server_address
+        self.server_port = server_port
+        self.local_ports = local_ports
+        self.config = config
+        self.observer = observer or TunnelObserver()
+
+        self.logger = Logger(config["logging"]["file"], config["logging"]["level"], config["logging"].get("rate_limit", 20.0), config["logging"].get("burst", 100))
+
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.frames: Optional[FrameWriter] = None
+        self.lanes: List[FrameWriter] = []
+        self.session_token: Optional[bytes] = None
+        self.max_lanes = 1
+        self.lingering: OrderedDict[int, Tuple[float, ReplayBuffer]] = OrderedDict()
+        self.linger_time = 60.0
+
+        self.running = False
+        self.reconnecting = False
+        self.stopped = asyncio.Event()
+        self.server_timeout = 15
+        self.last_pong = 0.0
+        self.remote_address: Optional[str] = None
+        self.remote_addresses: Dict[int, str] = {}
+
+        self.connection_map: Dict[int, TunnelStream] = {}
+        self.tasks: List[asyncio.Task] = []
+
+        self.traffic_upload = 0
+        self.traffic_download = 0
+        self.max_queue_size = 100
+        self.window_size = config.get("window_size", DEFAULT_WINDOW_SIZE)
+        self.compression = config.get("compression", {})
+        self.sockets = config.get("sockets", {})
+        self.lane_count = config.get("lanes", 1)
+        self.lane_join_attempts = 3
+        self.resume = config.get("resume", True)
+        self.capabilities = Capability.NONE
+        self.max_frame_size = 65536
+        self.max_chunk_size = self.max_frame_size
+
+        pool_config = config.get("local_pool", {})
+        self.local_pools = [LocalConnectionPool("127.0.0.1", port, self.sockets.get("local", {}), pool_config.get("max_size", 8) if pool_config.get("enabled") else 0, pool_config.get("idle_timeout", 30.0)) for port in local_ports]
+
+    async def log(self, message: str, level: str = "info", *args, sampled: bool = False):
+        message = message + "." if not message.endswith(".") else message
+        self.observer.on_log(message % args if args else message, level)
+
+        logger_level_map = {
+            "info": "info",
+            "success": "info",
+            "warning": "warning",
+            "error": "error"
+        }
+        await self.logger.log(message, logger_level_map.get(level, "info"), *args, sampled=sampled)
+
+    def count_traffic(self, upload: int = 0, download: int = 0):
+        self.traffic_upload += upload
+        self.traffic_download += download
+        self.observer.on_traffic(self.traffic_upload, self.traffic_download)
+
+    def requested_capabilities(self) -> Capability:
+        capabilities = Capability.WINDOWING | Capability.BATCHING
+        if self.compression.get("enabled"):
+            capabilities |= Capability.COMPRESSION
+        if len(self.local_ports) > 1:
+            capabilities |= Capability.BINDINGS
+        if self.lane_count > 1:
+            capabilities |= Capability.STRIPING
+        if self.resume:
+            capabilities |= Capability.RESUMPTION
+        return capabilities
+
+    @property
+    def resumable(self) -> bool:
+        return self.running and self.session_token is not None and bool(self.capabilities & Capability.RESUMPTION)
+
+    async def connect(self) -> bool:
+        try:
+            self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(self.server_address, self.server_port), timeout=5)
+            configure_socket(self.writer.get_extra_info("socket"), self.sockets.get("control", {}))
+            _, self.capabilities, self.max_frame_size = await asyncio.wait_for(client_handshake(self.reader, self.writer, self.username, self.password, self.requested_capabilities(), bindings=len(self.local_ports)), timeout=5)
+            self.max_chunk_size = self.max_frame_size - COMPRESSION_HEADROOM if self.capabilities & Capability.COMPRESSION else self.max_frame_size
+
+            self.frames = self.create_frame_writer(self.writer)
+            self.frames.start()
+            self.lanes = [self.frames]
+            self.last_pong = time.monotonic()
+
+            await self.log("Connection to server established.", "success")
+            if len(self.local_ports) > 1 and not self.capabilities & Capability.BINDINGS:
+                await self.log(f"Server does not support multiple bindings, only local port {self.local_ports[0]} is exposed.", "warning")
+            return True
+        except AuthenticationError as error:
+            await self.log(f"Server rejected tunnel: {error}", "error")
+            self.writer.close()
+            return False
+        except (asyncio.TimeoutError, ConnectionRefusedError, OSError, ConnectionError, ProtocolError) as error:
+            await self.log(f"Connection failed: {error}", "error")
+            if self.writer:
+                self.writer.close()
+            return False
+
+    def create_frame_writer(self, writer: asyncio.StreamWriter) -> FrameWriter:
+        return FrameWriter(writer, self.max_frame_size, queue_size=self.max_queue_size, max_batch_size=DEFAULT_BATCH_SIZE if self.capabilities & Capability.BATCHING else 1)
+
+    def create_compressor(self) -> StreamCompressor:
+        return StreamCompressor(self.compression.get("level", 6))
+
+    def join_lanes(self):
+        for _ in range(min(self.lane_count, self.max_lanes) - len(self.lanes)):
+            self.tasks.append(asyncio.create_task(self.join_lane()))
+
+    def linger(self, connection_id: int, replay: ReplayBuffer):
+        now = time.monotonic()
+        while self.lingering and next(iter(self.lingering.values()))[0] < now - self.linger_time:
+            self.lingering.popitem(last=False)
+
+        self.lingering[connection_id] = (now, replay)
+
+    async def resume_session(self) -> Optional[bool]:
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(self.server_address, self.server_port), timeout=5)
+            configure_socket(writer.get_extra_info("socket"), self.sockets.get("control", {}))
+            sent = resume_entries(self.connection_map, self.lingering, self.max_frame_size)
+            _, _, _, entries = await asyncio.wait_for(client_resume(reader, writer, self.session_token, sent, self.requested_capabilities(), self.max_frame_size), timeout=5)
+        except (AuthenticationError, ProtocolError) as error:
+            await self.log(f"Server refused to resume the session: {error}", "warning")
+            if writer:
+                writer.close()
+            return None
+        except (asyncio.TimeoutError, OSError) as error:
+            await self.log(f"Resume failed: {error}", "error")
+            if writer:
+                writer.close()
+            return False
+
+        self.reader, self.writer = reader, writer
+        self.frames = self.create_frame_writer(writer)
+        self.frames.start()
+        self.lanes = [self.frames]
+        self.last_pong = time.monotonic()
+
+        try:
+            resume_streams(self.connection_map, self.lingering, entries, sent, self.frames, self.max_chunk_size, self.create_compressor)
+        except ProtocolError as error:
+            await self.log(f"Failed to resume the session: {error}", "error")
+            return None
+
+        await self.log(f"Session resumed with {len(self.connection_map)} connections.", "success")
+        self.join_lanes()
+        return True
+
+    async def join_lane(self):
+        error: Optional[Exception] = None
+        for _ in range(self.lane_join_attempts):
+            writer = None
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(self.server_address, self.server_port), timeout=5)
+                configure_socket(writer.get_extra_info("socket"), self.sockets.get("control", {}))
+                await asyncio.wait_for(client_join(reader, writer, self.session_token, self.requested_capabilities(), self.max_frame_size), timeout=5)
+            except (AuthenticationError, asyncio.TimeoutError, OSError, ProtocolError) as join_error:
+                error = join_error
+                if writer:
+                    writer.close()
+                continue
+
+            frames = self.create_frame_writer(writer)
+            self.tasks.append(frames.start())
+            self.lanes.append(frames)
+            await self.log(f"Lane {len(self.lanes) - 1} joined.", "success")
+            await self.lane_listener_loop(reader, frames)
+            return
+
+        await self.log(f"Failed to open an additional lane: {error}", "warning")
+
+    async def lane_listener_loop(self, reader: asyncio.StreamReader, frames: FrameWriter):
+        try:
+            while self.running:
+                package_type, connection_id, payload = await unpack_package(reader)
+                await self.handle_incoming_package(package_type, connection_id, payload, frames)
+        except (asyncio.IncompleteReadError, ConnectionResetError, OSError, ProtocolError):
+            pass
+        finally:
+            await frames.close()
+            if not frames.writer.is_closing():
+                frames.writer.close()
+
+            if frames in self.lanes:
+                self.lanes.remove(frames)
+                if self.resumable:
+                    if self.writer and not self.writer.is_closing():
+                        self.writer.close()
+                else:
+                    for connection_id, stream in list(self.connection_map.items()):
+                        if stream.lane is frames:
+                            await self.close_connection(connection_id)
+
+                if self.running:
+                    await self.log("Lane to server closed.", "warning")
+
+    async def server_listener_loop(self):
+        while self.running:
+            try:
+                package_type, connection_id, payload = await unpack_package(self.reader)
+
+                await self.handle_incoming_package(package_type, connection_id, payload)
+            except (asyncio.IncompleteReadError, ConnectionResetError, OSError):
+                if self.running:
+                    await self.log("Connection to server lost.", "error")
+                    await self.reconnect()
+                break
+            except ProtocolError as error:
+                if self.running:
+                    if isinstance(error.__cause__, asyncio.IncompleteReadError):
+                        await self.log("Connection to server lost.", "error")
+                        await self.reconnect()
+                    else:
+                        await self.log(f"Server sent invalid package: {error}", "warning")
+                break
+
+    async def handle_incoming_package(self, package_type: PackageType, connection_id: int, payload: bytes, lane: Optional[FrameWriter] = None):
+        lane = lane or self.frames
+
+        if package_type == PackageType.PONG:
+            self.last_pong = time.monotonic()
+            try:
+                self.observer.on_ping(int((time.time() - float(payload.decode())) * 1000))
+            except ValueError:
+                self.observer.on_ping(None)
+
+        elif package_type == PackageType.NEW_CONNECTION:
+            try:
+                remote_port, binding = unpack_new_connection(payload)
+            except ProtocolError as error:
+                await self.log(f"Server sent invalid package: {error}", "warning")
+                return
+
+            if binding >= len(self.local_pools):
+                await self.log(f"Server announced unknown binding {binding}.", "warning")
+                if connection_id:
+                    self.send_package(PackageType.CLOSE, connection_id, lane=lane)
+                return
+
+            if connection_id == 0:
+                address = f"{self.server_address}:{remote_port}"
+                self.remote_addresses[binding] = address
+                self.remote_address = ", ".join(self.remote_addresses[index] for index in sorted(self.remote_addresses))
+                self.observer.on_address(self.remote_address)
+                await self.log(f"Tunnel available at {address} for local port {self.local_ports[binding]}." if len(self.local_ports) > 1 else f"Tunnel available at {address}.", "success")
+                return
+
+            windowing = self.capabilities & Capability.WINDOWING
+            stream = TunnelStream(connection_id, None, None, self.window_size if windowing else UNLIMITED_WINDOW)
+            if self.capabilities & Capability.COMPRESSION:
+                stream.compressor = self.create_compressor()
+            stream.lane = lane
+            if self.capabilities & Capability.RESUMPTION:
+                stream.replay = ReplayBuffer()
+            self.connection_map[connection_id] = stream
+            self.tasks.append(asyncio.create_task(self.open_local_connection(stream, self.local_pools[binding])))
+
+        elif package_type == PackageType.DATA or package_type == PackageType.COMPRESSED_DATA:
+            self.count_traffic(download=len(payload))
+
+            if connection_id in self.connection_map:
+                try:
+                    stream = self.connection_map[connection_id]
+                    if package_type == PackageType.COMPRESSED_DATA:
+                        if stream.decompressor is None:
+                            stream.decompressor = StreamDecompressor()
+                        payload = stream.decompressor.decompress(payload, self.max_frame_size)
+                    stream.feed(payload)
+                except ProtocolError as error:
+                    await self.log("Protocol violation on connection #%s: %s", "warning", connection_id, error)
+                    await self.close_connection(connection_id)
+
+        elif package_type == PackageType.SESSION:
+            try:
+                self.max_lanes, self.session_token = unpack_session(payload)
+            except ProtocolError as error:
+                await self.log(f"Server sent invalid package: {error}", "warning")
+                return
+
+            self.join_lanes()
+
+        elif package_type == PackageType.WINDOW_UPDATE:
+            increment = unpack_window_update(payload)
+            if connection_id in self.connection_map:
+                stream = self.connection_map[connection_id]
+                if stream.replay is not None:
+                    stream.replay.acknowledge(increment)
+                stream.send_window.grant(increment)
+            elif connection_id in self.lingering:
+                replay = self.lingering[connection_id][1]
+                replay.acknowledge(increment)
+                if not replay.pending:
+                    del self.lingering[connection_id]
+
+        elif package_type == PackageType.CLOSE:
+            if connection_id == 0:
+                reason = bytes(payload).decode(errors="replace") or "no reason given"
+                await self.log(f"Server rejected tunnel: {reason}", "error")
+            elif connection_id in self.connection_map:
+                stream = self.connection_map[connection_id]
+                stream.peer_closed = True
+                stream.finish()
+
+    async def open_local_connection(self, stream: TunnelStream, pool: LocalConnectionPool):
+        connection_id = stream.connection_id
+        await self.log("New connection #%s.", "success", connection_id, sampled=True)
+
+        try:
+            stream.reader, stream.writer = await pool.acquire()
+        except (ConnectionRefusedError, asyncio.TimeoutError, OSError):
+            await self.log("Failed to connect to local port %s.", "error", pool.port)
+            self.connection_map.pop(connection_id, None)
+            self.send_package(PackageType.CLOSE, connection_id, lane=stream.lane)
+            return
+
+        if self.connection_map.get(connection_id) is not stream:
+            stream.writer.close()
+            return
+
+        self.tasks.append(asyncio.create_task(self.pipe_local_to_server(stream)))
+        self.tasks.append(asyncio.create_task(self.pipe_server_to_local(stream)))
+
+        if self.capabilities & Capability.WINDOWING:
+            self.send_package(PackageType.WINDOW_UPDATE, connection_id, pack_window_update(self.window_size), stream.lane)
+        else:
+            stream.send_window.grant(UNLIMITED_WINDOW)
+
+    def send_package(self, package_type: PackageType, connection_id: int, payload: bytes = b"", lane: Optional[FrameWriter] = None) -> bool:
+        frames = lane or self.frames
+        return frames is not None and frames.send(package_type, connection_id, payload)
+
+    async def pipe_local_to_server(self, stream: TunnelStream):
+        connection_id = stream.connection_id
+        sizer = ReadSizer(4096, self.max_chunk_size)
+
+        try:
+            while self.running:
+                credit = await stream.send_window.wait()
+                if not credit:
+                    break
+                if (stream.lane is None or not await stream.lane.wait_writable()) and not self.resumable:
+                    break
+
+                requested = min(credit, sizer.size)
+                data = await stream.reader.read(requested)
+                if not data:
+                    break
+
+                sizer.update(len(data), requested)
+
+                stream.send_window.consume(len(data))
+                if stream.replay is not None:
+                    stream.replay.append(data)
+
+                lane = stream.lane
+                package_type, payload = await stream.compressor.encode(data) if stream.compressor else (PackageType.DATA, data)
+                if stream.lane is not lane:
+                    continue
+                self.count_traffic(upload=len(payload))
+
+                if not self.send_package(package_type, connection_id, payload, lane) and not self.resumable:
+                    await self.log("Error sending data to server: control connection closed.", "error")
+                    break
+        except (ConnectionResetError, OSError):
+            await self.log("Local socket closed connection #%s.", "info", connection_id, sampled=True)
+        except Exception as error:
+            await self.log(f"Error reading from local socket: {error}", "error")
+        finally:
+            if not stream.peer_closed:
+                self.send_package(PackageType.CLOSE, connection_id, lane=stream.lane)
+                if stream.replay is not None and stream.replay.pending and self.resumable:
+                    self.linger(connection_id, stream.replay)
+            await self.close_connection(connection_id)
+
+    async def pipe_server_to_local(self, stream: TunnelStream):
+        try:
+            while self.running:
+                payload = await stream.inbound.get()
+                if payload is None:
+                    break
+
+                stream.writer.write(payload)
+                await stream.writer.drain()
+
+                increment = stream.receive_window.release(len(payload))
+                if increment:
+                    self.send_package(PackageType.WINDOW_UPDATE, stream.connection_id, pack_window_update(increment), stream.lane)
+        except (ConnectionResetError, OSError):
+            pass
+        finally:
+            await self.close_connection(stream.connection_id)
+
+    async def close_connection(self, connection_id: int):
+        if connection_id in self.connection_map:
+            stream = self.connection_map.pop(connection_id)
+            stream.finish()
+            if stream.writer is None:
+                return
+            try:
+                stream.writer.close()
+                await stream.writer.wait_closed()
+            except (ConnectionResetError, OSError):
+                pass
+            await self.log("Connection #%s closed.", "info", connection_id, sampled=True)
+
+    async def ping_loop(self):
+        frames = self.frames
+        while self.running and self.frames is frames:
+            if not self.send_package(PackageType.PING, 0, str(time.time()).encode()):
+                self.observer.on_ping(None)
+                break
+
+            if time.monotonic() - self.last_pong > self.server_timeout:
+                await self.log(f"Server not responding for {self.server_timeout} seconds.", "error")
+                if self.writer and not self.writer.is_closing():
+                    self.writer.close()
+                break
+
+            await asyncio.sleep(2)
+
+    async def start(self) -> bool:
+        self.running = True
+        self.stopped.clear()
+
+        if await self.connect():
+            self.tasks = [asyncio.create_task(self.server_listener_loop()), asyncio.create_task(self.ping_loop())]
+            return True
+
+        return False
+
+    async def run(self) -> bool:
+        if not await self.start():
+            await self.stop()
+            return False
+
+        await self.stopped.wait()
+        return True
+
+    async def stop(self):
+        if not self.running and self.stopped.is_set():
+            return
+
+        await self.log("Stopping client.", "warning")
+        self.running = False
+        if self.capabilities & Capability.RESUMPTION and self.session_token:
+            self.send_package(PackageType.DISCONNECT, 0)
+
+        current = asyncio.current_task()
+        tasks = [task for task in self.tasks if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        await self.disconnect()
+        for pool in self.local_pools:
+            await pool.close()
+
+        self.reconnecting = False
+        self.remote_address = None
+        self.remote_addresses.clear()
+        self.observer.on_address(None)
+        self.stopped.set()
+        await self.observer.on_stopped()
+
+    async def disconnect(self, keep_streams: bool = False):
+        if not keep_streams:
+            self.tasks.clear()
+            for connection_id in list(self.connection_map):
+                await self.close_connection(connection_id)
+            self.lingering.clear()
+            self.session_token = None
+
+        lanes, self.lanes = self.lanes[1:], []
+        for lane in lanes:
+            lane.writer.close()
+            await lane.close()
+        if self.frames:
+            await self.frames.close()
+            self.frames = None
+        if self.writer:
+            try:
+                self.writer.close()
+                await self.writer.wait_closed()
+            except (ConnectionResetError, OSError):
+                pass
+            self.writer = None
+
+    async def reconnect(self):
+        if self.reconnecting:
+            return
+
+        self.reconnecting = True
+        await self.log("Reconnecting...", "info")
+        resumable = self.resumable
+        await self.disconnect(keep_streams=resumable)
+
+        max_attempts = 10
+        for attempt in range(max_attempts):
+            if resumable:
+                resumed = await self.resume_session()
+                if resumed is None:
+                    resumable = False
+                    await self.disconnect()
+
+            if (resumable and resumed) or (not resumable and await self.connect()):
+                self.tasks += [asyncio.create_task(self.server_listener_loop()), asyncio.create_task(self.ping_loop())]
+                self.reconnecting = False
+                return
+
+            delay = 1 if resumable else 5
+            await self.log(f"Retry {attempt + 1}/{max_attempts} in {delay} seconds...", "warning")
+            await asyncio.sleep(delay)
+
+        await self.log("Failed to reconnect.", "error")
+        await self.stop()
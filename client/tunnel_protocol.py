@@ -1,8 +1,16 @@
 import asyncio
+import logging
+import socket
 import struct
 import enum
-from asyncio import StreamReader
-from typing import Tuple
+import time
+import zlib
+from asyncio import StreamReader, StreamWriter
+from collections import deque
+from functools import partial
+from logging.handlers import QueueHandler
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
 
 
 class PackageType(enum.IntEnum):
@@ -11,35 +19,764 @@ class PackageType(enum.IntEnum):
     NEW_CONNECTION = 3
     DATA = 4
     CLOSE = 5
+    WINDOW_UPDATE = 6
+    HELLO = 7
+    AUTH = 8
+    AUTH_RESULT = 9
+    COMPRESSED_DATA = 10
+    SESSION = 11
+    JOIN = 12
+    RESUME = 13
+    DISCONNECT = 14
+
+class Capability(enum.IntFlag):
+    NONE = 0
+    WINDOWING = 1
+    BATCHING = 2
+    COMPRESSION = 4
+    BINDINGS = 8
+    STRIPING = 16
+    RESUMPTION = 32
+
+class AuthFlag(enum.IntFlag):
+    NONE = 0
+    TEST = 1
+
+class ResumeFlag(enum.IntFlag):
+    NONE = 0
+    CLOSING = 1
+
+class AuthStatus(enum.IntEnum):
+    OK = 0
+    INVALID_CREDENTIALS = 1
+    UNAVAILABLE = 2
 
 class ProtocolError(Exception):
     pass
 
+class AuthenticationError(Exception):
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(message or f"Authentication failed with status {status}")
+        self.status = status
 
-def pack_package(package_type: int, connection_id: int, payload: bytes = b"", max_payload_size: int = 65536) -> bytes:
-    if not isinstance(package_type, int) or package_type not in PackageType:
+
+HEADER = struct.Struct("!BII")
+HEADER_SIZE = HEADER.size
+WINDOW_INCREMENT = struct.Struct("!I")
+HELLO = struct.Struct("!HII")
+AUTH = struct.Struct("!BHH")
+AUTH_RESULT = struct.Struct("!B")
+BINDING_COUNT = struct.Struct("!H")
+NEW_CONNECTION = struct.Struct("!IH")
+SESSION_TOKEN_SIZE = 16
+SESSION = struct.Struct(f"!H{SESSION_TOKEN_SIZE}s")
+RESUME_ENTRY = struct.Struct("!IBQQ")
+PROTOCOL_VERSION = 1
+COMPRESSION_HEADROOM = 256
+MAX_CONNECTION_ID = 2**31 - 1
+DEFAULT_WINDOW_SIZE = 262144
+DEFAULT_BATCH_SIZE = 262144
+UNLIMITED_WINDOW = 2**62
+PACKAGE_TYPES = frozenset(PackageType)
+PRIORITY_TYPES = frozenset({PackageType.PING, PackageType.PONG, PackageType.NEW_CONNECTION, PackageType.WINDOW_UPDATE})
+
+
+class FlowWindow:
+    def __init__(self, credit: int = 0):
+        self.credit = credit
+        self.consumed_total = 0
+        self.closed = False
+        self.event = asyncio.Event()
+        self.listener: Optional[Callable[[], None]] = None
+        if credit > 0:
+            self.event.set()
+
+    def grant(self, amount: int) -> None:
+        self.credit += amount
+        if self.credit > 0:
+            self.event.set()
+            if self.listener:
+                self.listener()
+
+    def reset(self, credit: int) -> None:
+        self.credit = 0
+        self.event.clear()
+        self.grant(credit)
+
+    def consume(self, amount: int) -> None:
+        self.credit -= amount
+        self.consumed_total += amount
+        if self.credit <= 0:
+            self.event.clear()
+
+    async def wait(self) -> int:
+        while self.credit <= 0 and not self.closed:
+            await self.event.wait()
+        return 0 if self.closed else self.credit
+
+    def close(self) -> None:
+        self.closed = True
+        self.event.set()
+
+class ReceiveWindow:
+    def __init__(self, size: int = DEFAULT_WINDOW_SIZE):
+        self.size = size
+        self.outstanding = 0
+        self.consumed = 0
+        self.received_total = 0
+        self.granted_total = size
+
+    def receive(self, amount: int) -> None:
+        self.received_total += amount
+        self.outstanding += amount
+        if self.outstanding > self.size:
+            raise ProtocolError(f"Flow control window exceeded: {self.outstanding} bytes, window {self.size}")
+
+    def release(self, amount: int) -> int:
+        self.consumed += amount
+        if self.consumed < self.size // 2:
+            return 0
+
+        increment, self.consumed = self.consumed, 0
+        self.outstanding -= increment
+        self.granted_total += increment
+        return increment
+
+class ReplayBuffer:
+    def __init__(self):
+        self.chunks: Deque[memoryview] = deque()
+        self.start = 0
+        self.end = 0
+        self.window: Optional[int] = None
+        self.granted = 0
+
+    @property
+    def pending(self) -> int:
+        return self.end - self.start
+
+    def append(self, data: Union[bytes, memoryview]) -> None:
+        if data:
+            self.chunks.append(memoryview(data))
+            self.end += len(data)
+
+    def acknowledge(self, amount: int) -> None:
+        self.granted += amount
+        if self.window is None:
+            self.window = amount
+        else:
+            self.trim(self.granted - self.window)
+
+    def trim(self, offset: int) -> None:
+        while self.chunks and self.start < offset:
+            chunk = self.chunks[0]
+            if self.start + len(chunk) <= offset:
+                self.chunks.popleft()
+                self.start += len(chunk)
+            else:
+                self.chunks[0] = chunk[offset - self.start:]
+                self.start = offset
+
+    def rewind(self, received: int, granted: int) -> List[memoryview]:
+        if not self.start <= received <= self.end:
+            raise ProtocolError(f"Peer resumed at byte {received}, replay buffer holds {self.start}-{self.end}")
+
+        self.trim(received)
+        chunks = list(self.chunks)
+        self.chunks.clear()
+        self.start = self.end = received
+        self.granted = granted
+        if self.window is None:
+            self.window = granted - received
+        return chunks
+
+    def retransmit(self, received: int, granted: int, max_chunk_size: int, send: Callable[[memoryview], Any]) -> int:
+        credit = granted - received
+        for chunk in self.rewind(received, granted):
+            for offset in range(0, len(chunk), max_chunk_size):
+                piece = chunk[offset:offset + max_chunk_size]
+                self.append(piece)
+                credit -= len(piece)
+                send(piece)
+
+        return credit
+
+class TunnelStream:
+    def __init__(self, connection_id: int, reader: Optional[StreamReader], writer: Optional[StreamWriter], window_size: int = DEFAULT_WINDOW_SIZE):
+        self.connection_id = connection_id
+        self.reader = reader
+        self.writer = writer
+        self.send_window = FlowWindow()
+        self.receive_window = ReceiveWindow(window_size)
+        self.inbound: asyncio.Queue = asyncio.Queue()
+        self.idle_timer = None
+        self.lane: Optional["FrameWriter"] = None
+        self.replay: Optional[ReplayBuffer] = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.decompressor: Optional[StreamDecompressor] = None
+        self.remote_port = 0
+        self.opened = time.monotonic()
+        self.peer_closed = False
+
+    def feed(self, payload: bytes) -> None:
+        self.receive_window.receive(len(payload))
+        self.inbound.put_nowait(payload)
+
+    def finish(self) -> None:
+        self.send_window.close()
+        self.inbound.put_nowait(None)
+
+    async def close(self) -> None:
+        self.send_window.close()
+        try:
+            if self.writer and not self.writer.is_closing():
+                self.writer.close()
+                await self.writer.wait_closed()
+        except (ConnectionResetError, OSError):
+            pass
+
+
+class ReadSizer:
+    def __init__(self, minimum: int = 4096, maximum: int = 65536):
+        self.minimum = min(minimum, maximum)
+        self.maximum = maximum
+        self.size = self.minimum
+
+    def update(self, received: int, requested: int) -> None:
+        if received >= self.size:
+            self.size = min(self.size * 2, self.maximum)
+        elif received < requested // 4:
+            self.size = max(self.size // 2, self.minimum)
+
+class CompressionStats:
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.bytes_decompressed = 0
+        self.skipped_bytes = 0
+        self.disabled_streams = 0
+        self.compress_time = 0.0
+        self.decompress_time = 0.0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+    def snapshot(self) -> dict:
+        return {
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_saved,
+            "bytes_decompressed": self.bytes_decompressed,
+            "skipped_bytes": self.skipped_bytes,
+            "disabled_streams": self.disabled_streams,
+            "compress_time": self.compress_time,
+            "decompress_time": self.decompress_time
+        }
+
+COMPRESSION_STATS = CompressionStats()
+
+class FrameStats:
+    def __init__(self):
+        self.frames_sent = [0] * (max(PackageType) + 1)
+        self.frames_received = [0] * (max(PackageType) + 1)
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.drain_time = 0.0
+        self.drains = 0
+
+    def merge(self, other: "FrameStats") -> None:
+        for package_type in range(len(self.frames_sent)):
+            self.frames_sent[package_type] += other.frames_sent[package_type]
+            self.frames_received[package_type] += other.frames_received[package_type]
+        self.bytes_sent += other.bytes_sent
+        self.bytes_received += other.bytes_received
+        self.drain_time += other.drain_time
+        self.drains += other.drains
+
+class StreamCompressor:
+    def __init__(self, level: int = 6, min_size: int = 512, offload_threshold: int = 16384, sample_size: int = 1024, min_ratio: float = 0.9, max_skips: int = 8, stats: CompressionStats = COMPRESSION_STATS):
+        self.level = level
+        self.min_size = min_size
+        self.offload_threshold = offload_threshold
+        self.sample_size = sample_size
+        self.min_ratio = min_ratio
+        self.max_skips = max_skips
+        self.stats = stats
+        self.context = None
+        self.enabled = True
+        self.skips = 0
+
+    def worthwhile(self, data: Union[bytes, memoryview]) -> bool:
+        if not self.enabled or len(data) < self.min_size:
+            return False
+
+        sample = data[:self.sample_size]
+        if len(zlib.compress(sample, 1)) <= len(sample) * self.min_ratio:
+            self.skips = 0
+            return True
+
+        self.stats.skipped_bytes += len(data)
+        self.skips += 1
+        if self.skips >= self.max_skips:
+            self.enabled = False
+            self.context = None
+            self.stats.disabled_streams += 1
+        return False
+
+    def compress(self, data: Union[bytes, memoryview]) -> Tuple[bytes, float]:
+        started = time.thread_time()
+        if self.context is None:
+            self.context = zlib.compressobj(self.level)
+
+        compressed = self.context.compress(data) + self.context.flush(zlib.Z_SYNC_FLUSH)
+        return compressed, time.thread_time() - started
+
+    def record(self, size: int, compressed: bytes, elapsed: float) -> bytes:
+        self.stats.compress_time += elapsed
+        self.stats.bytes_in += size
+        self.stats.bytes_out += len(compressed)
+        return compressed
+
+    def encode_nowait(self, data: Union[bytes, memoryview]) -> Tuple[PackageType, Union[bytes, memoryview]]:
+        if not self.worthwhile(data):
+            return PackageType.DATA, data
+        return PackageType.COMPRESSED_DATA, self.record(len(data), *self.compress(data))
+
+    async def encode(self, data: Union[bytes, memoryview]) -> Tuple[PackageType, Union[bytes, memoryview]]:
+        if len(data) < self.offload_threshold:
+            return self.encode_nowait(data)
+        if not self.worthwhile(data):
+            return PackageType.DATA, data
+        return PackageType.COMPRESSED_DATA, await self.compress_offloaded(data)
+
+    async def compress_offloaded(self, data: Union[bytes, memoryview]) -> bytes:
+        return self.record(len(data), *await asyncio.get_running_loop().run_in_executor(None, self.compress, data))
+
+class StreamDecompressor:
+    def __init__(self, stats: CompressionStats = COMPRESSION_STATS):
+        self.stats = stats
+        self.context = zlib.decompressobj()
+
+    def decompress(self, payload: Union[bytes, memoryview], max_size: int) -> bytes:
+        started = time.thread_time()
+        try:
+            data = self.context.decompress(payload, max_size)
+        except zlib.error as error:
+            raise ProtocolError(f"Invalid compressed payload: {error}") from error
+        if self.context.unconsumed_tail:
+            raise ProtocolError(f"Decompressed payload exceeds {max_size} bytes")
+
+        self.stats.decompress_time += time.thread_time() - started
+        self.stats.bytes_decompressed += len(data)
+        return data
+
+
+class FrameWriter:
+    def __init__(self, writer: StreamWriter, max_payload_size: int = 65536, write_timeout: float = 5.0, queue_size: int = 1000, max_batch_size: int = DEFAULT_BATCH_SIZE, stats: Optional[FrameStats] = None):
+        self.writer = writer
+        self.max_payload_size = max_payload_size
+        self.write_timeout = write_timeout
+        self.queue_size = queue_size
+        self.max_batch_size = max_batch_size
+        self.priority: Deque[Union[bytes, memoryview]] = deque()
+        self.ordered: Deque[Tuple[bytes, Union[bytes, memoryview]]] = deque()
+        self.pending = asyncio.Event()
+        self.writable = asyncio.Event()
+        self.writable.set()
+        self.waiters: List[Callable[[], None]] = []
+        self.closed = False
+        self.task: Optional[asyncio.Task] = None
+        self.stats = stats or FrameStats()
+
+    def start(self) -> asyncio.Task:
+        self.task = asyncio.create_task(self.run())
+        return self.task
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.priority) + len(self.ordered)
+
+    def header(self, package_type: int, connection_id: int, length: int) -> bytes:
+        if length > self.max_payload_size:
+            raise ProtocolError(f"Payload too large: {length} bytes, maximum {self.max_payload_size}")
+
+        return HEADER.pack(package_type, connection_id, length)
+
+    def send(self, package_type: int, connection_id: int, payload: Union[bytes, memoryview] = b"") -> bool:
+        if self.closed:
+            return False
+
+        header = self.header(package_type, connection_id, len(payload))
+        self.stats.frames_sent[package_type] += 1
+        self.stats.bytes_sent += HEADER_SIZE + len(payload)
+        if package_type in PRIORITY_TYPES:
+            self.priority.append(header)
+            if payload:
+                self.priority.append(payload)
+        else:
+            self.ordered.append((header, payload))
+            if len(self.ordered) >= self.queue_size:
+                self.writable.clear()
+
+        self.pending.set()
+        return True
+
+    async def wait_writable(self) -> bool:
+        while not self.writable.is_set() and not self.closed:
+            await self.writable.wait()
+        return not self.closed
+
+    def notify_writable(self, callback: Callable[[], None]) -> None:
+        self.waiters.append(callback)
+
+    def set_writable(self) -> None:
+        self.writable.set()
+        waiters, self.waiters = self.waiters, []
+        for callback in waiters:
+            callback()
+
+    async def run(self) -> None:
+        try:
+            while True:
+                await self.pending.wait()
+                self.pending.clear()
+
+                while self.priority or self.ordered:
+                    batch = list(self.priority)
+                    self.priority.clear()
+
+                    size = 0
+                    while self.ordered and size < self.max_batch_size:
+                        header, payload = self.ordered.popleft()
+                        batch.append(header)
+                        if payload:
+                            batch.append(payload)
+                        size += HEADER_SIZE + len(payload)
+
+                    transport = self.writer.transport
+                    if transport.is_closing():
+                        return
+                    self.writer.writelines(batch)
+                    if transport.get_write_buffer_size() > transport.get_write_buffer_limits()[1]:
+                        self.writable.clear()
+
+                    started = time.perf_counter()
+                    await asyncio.wait_for(self.writer.drain(), timeout=self.write_timeout)
+                    self.stats.drain_time += time.perf_counter() - started
+                    self.stats.drains += 1
+
+                    if len(self.ordered) < self.queue_size and not self.writable.is_set():
+                        self.set_writable()
+
+                if self.closed:
+                    break
+        except (asyncio.TimeoutError, ConnectionResetError, OSError):
+            if not self.writer.is_closing():
+                self.writer.close()
+        finally:
+            self.closed = True
+            self.priority.clear()
+            self.ordered.clear()
+            self.set_writable()
+
+    async def close(self) -> None:
+        self.closed = True
+        self.pending.set()
+        if self.task and not self.task.done():
+            try:
+                await asyncio.wait_for(self.task, timeout=self.write_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+
+
+class FrameProtocol(asyncio.BufferedProtocol):
+    def __init__(self, frame_received: Callable[[int, int, memoryview], None], max_payload_size: int = 65536):
+        self.frame_received = frame_received
+        self.max_payload_size = max_payload_size
+        self.buffer = bytearray(max(2 * (HEADER_SIZE + max_payload_size), 262144))
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+        self.transport: Optional[asyncio.Transport] = None
+        self.error: Optional[BaseException] = None
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        if len(self.buffer) - self.end < HEADER_SIZE + self.max_payload_size:
+            remaining = self.end - self.start
+            self.buffer[:remaining] = bytes(self.view[self.start:self.end])
+            self.start, self.end = 0, remaining
+
+        return self.view[self.end:]
+
+    def buffer_updated(self, nbytes: int) -> None:
+        self.end += nbytes
+
+        try:
+            self.process()
+        except ProtocolError as error:
+            self.error = error
+            self.transport.close()
+
+    def process(self) -> None:
+        view = self.view
+        start, end = self.start, self.end
+
+        while end - start >= HEADER_SIZE:
+            package_type, connection_id, length = HEADER.unpack_from(self.buffer, start)
+            if package_type not in PACKAGE_TYPES:
+                raise ProtocolError(f"Unknown package type: {package_type}")
+            if connection_id > MAX_CONNECTION_ID:
+                raise ProtocolError(f"Invalid connection_id: {connection_id}")
+            if length > self.max_payload_size:
+                raise ProtocolError(f"Payload too large: {length} bytes, maximum {self.max_payload_size}")
+
+            frame_end = start + HEADER_SIZE + length
+            if frame_end > end:
+                break
+
+            self.start = frame_end
+            self.frame_received(package_type, connection_id, view[start + HEADER_SIZE:frame_end])
+            start = frame_end
+
+        if self.start == self.end:
+            self.start = self.end = 0
+
+    def eof_received(self) -> bool:
+        return False
+
+    def connection_lost(self, error: Optional[Exception]) -> None:
+        if not self.closed.done():
+            self.closed.set_result(self.error or error)
+
+
+class DeferredQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, rate: float, burst: int):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.buckets: Dict[str, List[float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.rate or record.levelno > logging.INFO or not getattr(record, "sampled", False) or not isinstance(record.args, tuple):
+            return True
+
+        now = time.monotonic()
+        bucket = self.buckets.get(record.msg)
+        if bucket is None:
+            bucket = self.buckets[record.msg] = [float(self.burst), now, 0]
+
+        tokens = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1.0:
+            bucket[0] = tokens
+            bucket[2] += 1
+            return False
+
+        bucket[0] = tokens - 1.0
+        if bucket[2]:
+            record.msg = f"{record.msg} (%d similar messages suppressed)"
+            record.args = record.args + (int(bucket[2]),)
+            bucket[2] = 0
+        return True
+
+
+def configure_socket(sock: Optional[socket.socket], options: Dict[str, Any]) -> None:
+    if sock is None:
+        return
+
+    try:
+        if sock.family in (socket.AF_INET, socket.AF_INET6) and options.get("nodelay") is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(options["nodelay"]))
+        if options.get("rcvbuf"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, options["rcvbuf"])
+        if options.get("sndbuf"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, options["sndbuf"])
+    except OSError:
+        pass
+
+def install_event_loop(name: str = "auto") -> None:
+    if name == "asyncio":
+        asyncio.set_event_loop_policy(None)
+        return
+
+    try:
+        import uvloop
+    except ImportError:
+        if name == "uvloop":
+            raise RuntimeError("Event loop uvloop requested but the uvloop package is not installed")
+        return
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+def describe_event_loop() -> str:
+    loop = asyncio.get_running_loop()
+    if type(loop).__module__.startswith("uvloop"):
+        import uvloop
+        return f"uvloop {uvloop.__version__}"
+
+    return f"asyncio {type(loop).__name__}"
+
+
+def pack_window_update(increment: int) -> bytes:
+    return WINDOW_INCREMENT.pack(increment)
+
+def unpack_window_update(payload: Union[bytes, memoryview]) -> int:
+    if len(payload) != WINDOW_INCREMENT.size:
+        raise ProtocolError(f"Invalid WINDOW_UPDATE payload: {len(payload)} bytes")
+
+    return WINDOW_INCREMENT.unpack(payload)[0]
+
+
+def pack_hello(version: int, capabilities: int, max_frame_size: int) -> bytes:
+    return HELLO.pack(version, capabilities, max_frame_size)
+
+def unpack_hello(payload: Union[bytes, memoryview]) -> Tuple[int, Capability, int]:
+    if len(payload) < HELLO.size:
+        raise ProtocolError(f"Invalid HELLO payload: {len(payload)} bytes")
+
+    version, capabilities, max_frame_size = HELLO.unpack_from(payload)
+    return version, Capability(capabilities), max_frame_size
+
+def pack_auth(login: str, password: str, flags: int = AuthFlag.NONE, bindings: int = 1) -> bytes:
+    login_bytes, password_bytes = login.encode(), password.encode()
+    payload = AUTH.pack(flags, len(login_bytes), len(password_bytes)) + login_bytes + password_bytes
+    return payload + BINDING_COUNT.pack(bindings) if bindings != 1 else payload
+
+def unpack_auth(payload: Union[bytes, memoryview]) -> Tuple[str, str, AuthFlag, int]:
+    if len(payload) < AUTH.size:
+        raise ProtocolError(f"Invalid AUTH payload: {len(payload)} bytes")
+
+    flags, login_length, password_length = AUTH.unpack_from(payload)
+    credentials_end = AUTH.size + login_length + password_length
+    if len(payload) not in (credentials_end, credentials_end + BINDING_COUNT.size):
+        raise ProtocolError("AUTH payload length mismatch")
+
+    try:
+        login = bytes(payload[AUTH.size:AUTH.size + login_length]).decode()
+        password = bytes(payload[AUTH.size + login_length:credentials_end]).decode()
+    except UnicodeDecodeError as error:
+        raise ProtocolError("AUTH credentials are not valid UTF-8") from error
+
+    bindings = BINDING_COUNT.unpack_from(payload, credentials_end)[0] if len(payload) > credentials_end else 1
+    if bindings < 1:
+        raise ProtocolError("AUTH requested no bindings")
+
+    return login, password, AuthFlag(flags), bindings
+
+def pack_auth_result(status: int, message: str = "") -> bytes:
+    return AUTH_RESULT.pack(status) + message.encode()
+
+def unpack_auth_result(payload: Union[bytes, memoryview]) -> Tuple[int, str]:
+    if len(payload) < AUTH_RESULT.size:
+        raise ProtocolError(f"Invalid AUTH_RESULT payload: {len(payload)} bytes")
+
+    return AUTH_RESULT.unpack_from(payload)[0], bytes(payload[AUTH_RESULT.size:]).decode(errors="replace")
+
+
+def pack_session(max_lanes: int, token: bytes) -> bytes:
+    return SESSION.pack(max_lanes, token)
+
+def unpack_session(payload: Union[bytes, memoryview]) -> Tuple[int, bytes]:
+    if len(payload) != SESSION.size:
+        raise ProtocolError(f"Invalid SESSION payload: {len(payload)} bytes")
+
+    return SESSION.unpack(payload)
+
+def unpack_join(payload: Union[bytes, memoryview]) -> bytes:
+    if len(payload) != SESSION_TOKEN_SIZE:
+        raise ProtocolError(f"Invalid JOIN payload: {len(payload)} bytes")
+
+    return bytes(payload)
+
+def pack_resume(token: bytes, entries: Dict[int, Tuple[int, int, int]]) -> bytes:
+    return token + b"".join(RESUME_ENTRY.pack(connection_id, flags, received, granted) for connection_id, (flags, received, granted) in entries.items())
+
+def unpack_resume(payload: Union[bytes, memoryview]) -> Tuple[bytes, Dict[int, Tuple[ResumeFlag, int, int]]]:
+    if len(payload) < SESSION_TOKEN_SIZE or (len(payload) - SESSION_TOKEN_SIZE) % RESUME_ENTRY.size:
+        raise ProtocolError(f"Invalid RESUME payload: {len(payload)} bytes")
+
+    entries = {}
+    for offset in range(SESSION_TOKEN_SIZE, len(payload), RESUME_ENTRY.size):
+        connection_id, flags, received, granted = RESUME_ENTRY.unpack_from(payload, offset)
+        entries[connection_id] = (ResumeFlag(flags), received, granted)
+    return bytes(payload[:SESSION_TOKEN_SIZE]), entries
+
+def resume_entries(streams: Dict[int, Any], lingering: Dict[int, Any], max_frame_size: int = 65536) -> Dict[int, Tuple[int, int, int]]:
+    limit = (max_frame_size - SESSION_TOKEN_SIZE) // RESUME_ENTRY.size
+    entries = {connection_id: (ResumeFlag.NONE, stream.receive_window.received_total, stream.receive_window.granted_total) for connection_id, stream in islice(streams.items(), limit)}
+    entries.update(islice(((connection_id, (ResumeFlag.CLOSING, 0, 0)) for connection_id in lingering if connection_id not in entries), limit - len(entries)))
+    return entries
+
+def resume_streams(streams: Dict[int, Any], lingering: Dict[int, Tuple[float, ReplayBuffer]], entries: Dict[int, Tuple[ResumeFlag, int, int]], sent: Dict[int, Tuple[int, int, int]], lane: FrameWriter, max_chunk_size: int, create_compressor: Callable[[], StreamCompressor]) -> None:
+    for connection_id, stream in list(streams.items()):
+        entry = entries.get(connection_id) if connection_id in sent else None
+        if entry is None:
+            stream.finish()
+            continue
+
+        stream.lane = lane
+        stream.decompressor = None
+        if stream.compressor:
+            stream.compressor = create_compressor()
+
+        flags, received, granted = entry
+        if stream.replay is not None and not flags & ResumeFlag.CLOSING:
+            stream.send_window.reset(stream.replay.retransmit(received, granted, max_chunk_size, partial(lane.send, PackageType.DATA, connection_id)))
+
+    for connection_id, (_, replay) in lingering.items():
+        entry = entries.get(connection_id) if connection_id in sent else None
+        if entry is not None and not entry[0] & ResumeFlag.CLOSING:
+            replay.retransmit(entry[1], entry[2], max_chunk_size, partial(lane.send, PackageType.DATA, connection_id))
+            lane.send(PackageType.CLOSE, connection_id)
+    lingering.clear()
+
+def pack_new_connection(port: int, binding: Optional[int] = None) -> bytes:
+    return port.to_bytes(4, "big") if binding is None else NEW_CONNECTION.pack(port, binding)
+
+def unpack_new_connection(payload: Union[bytes, memoryview]) -> Tuple[int, int]:
+    if len(payload) == NEW_CONNECTION.size:
+        return NEW_CONNECTION.unpack(payload)
+    if len(payload) == 4:
+        return int.from_bytes(payload, "big"), 0
+
+    raise ProtocolError(f"Invalid NEW_CONNECTION payload: {len(payload)} bytes")
+
+
+def pack_header(package_type: int, connection_id: int, length: int, max_payload_size: int = 65536) -> bytes:
+    if not isinstance(package_type, int) or package_type not in PACKAGE_TYPES:
         raise ProtocolError(f"Invalid package type: {package_type}")
-    if not isinstance(connection_id, int) or connection_id < 0 or connection_id > 2**31 - 1:
+    if not isinstance(connection_id, int) or connection_id < 0 or connection_id > MAX_CONNECTION_ID:
         raise ProtocolError(f"Invalid connection_id: {connection_id}")
-    if len(payload) > max_payload_size:
-        raise ProtocolError(f"Payload too large: {len(payload)} bytes, maximum {max_payload_size}")
+    if length > max_payload_size:
+        raise ProtocolError(f"Payload too large: {length} bytes, maximum {max_payload_size}")
+
+    return HEADER.pack(package_type, connection_id, length)
 
-    return struct.pack("!BII", package_type, connection_id, len(payload)) + payload
+def pack_package(package_type: int, connection_id: int, payload: bytes = b"", max_payload_size: int = 65536) -> bytes:
+    return pack_header(package_type, connection_id, len(payload), max_payload_size) + payload
 
-async def unpack_package(reader: StreamReader, max_payload_size: int = 65536) -> Tuple[int, int, bytes]:
+async def unpack_package(reader: StreamReader, max_payload_size: int = 65536, prefix: bytes = b"") -> Tuple[int, int, bytes]:
     try:
-        header = await reader.readexactly(9)
+        header = prefix + await reader.readexactly(HEADER_SIZE - len(prefix))
     except asyncio.IncompleteReadError as error:
-        raise ProtocolError(f"Incomplete header: expected 9 bytes, received {len(error.partial)}") from error
+        raise ProtocolError(f"Incomplete header: expected {HEADER_SIZE} bytes, received {len(prefix) + len(error.partial)}") from error
 
     try:
-        package_type, connection_id, length = struct.unpack("!BII", header)
+        package_type, connection_id, length = HEADER.unpack(header)
     except struct.error as error:
         raise ProtocolError("Failed to unpack header") from error
 
-    if package_type not in PackageType:
+    if package_type not in PACKAGE_TYPES:
         raise ProtocolError(f"Unknown package type: {package_type}")
-    if connection_id < 0 or connection_id > 2**31 - 1:
+    if connection_id > MAX_CONNECTION_ID:
         raise ProtocolError(f"Invalid connection_id: {connection_id}")
     if length > max_payload_size:
         raise ProtocolError(f"Payload too large: {length} bytes, maximum {max_payload_size}")
@@ -50,3 +787,47 @@ async def unpack_package(reader: StreamReader, max_payload_size: int = 65536) ->
         raise ProtocolError(f"Incomplete payload: expected {length} bytes, received {len(error.partial)}") from error
 
     return package_type, connection_id, payload
+
+
+async def read_handshake_reply(reader: StreamReader, max_frame_size: int) -> Tuple[int, Capability, int]:
+    package_type, _, payload = await unpack_package(reader, max_payload_size=max_frame_size)
+    if package_type != PackageType.HELLO:
+        raise ProtocolError(f"Expected HELLO package, received {package_type}")
+    version, capabilities, max_frame_size = unpack_hello(payload)
+
+    package_type, _, payload = await unpack_package(reader, max_payload_size=max_frame_size)
+    if package_type != PackageType.AUTH_RESULT:
+        raise ProtocolError(f"Expected AUTH_RESULT package, received {package_type}")
+
+    status, message = unpack_auth_result(payload)
+    if status != AuthStatus.OK:
+        raise AuthenticationError(status, message)
+
+    return version, capabilities, max_frame_size
+
+async def client_handshake(reader: StreamReader, writer: StreamWriter, login: str, password: str, capabilities: int, max_frame_size: int = 65536, flags: int = AuthFlag.NONE, bindings: int = 1) -> Tuple[int, Capability, int]:
+    writer.write(pack_package(PackageType.HELLO, 0, pack_hello(PROTOCOL_VERSION, capabilities, max_frame_size)))
+    writer.write(pack_package(PackageType.AUTH, 0, pack_auth(login, password, flags, bindings)))
+    await writer.drain()
+
+    return await read_handshake_reply(reader, max_frame_size)
+
+async def client_join(reader: StreamReader, writer: StreamWriter, token: bytes, capabilities: int, max_frame_size: int = 65536) -> Tuple[int, Capability, int]:
+    writer.write(pack_package(PackageType.HELLO, 0, pack_hello(PROTOCOL_VERSION, capabilities, max_frame_size)))
+    writer.write(pack_package(PackageType.JOIN, 0, token))
+    await writer.drain()
+
+    return await read_handshake_reply(reader, max_frame_size)
+
+async def client_resume(reader: StreamReader, writer: StreamWriter, token: bytes, entries: Dict[int, Tuple[int, int, int]], capabilities: int, max_frame_size: int = 65536) -> Tuple[int, Capability, int, Dict[int, Tuple[ResumeFlag, int, int]]]:
+    writer.write(pack_package(PackageType.HELLO, 0, pack_hello(PROTOCOL_VERSION, capabilities, max_frame_size)))
+    writer.write(pack_package(PackageType.RESUME, 0, pack_resume(token, entries), max_payload_size=max_frame_size))
+    await writer.drain()
+
+    version, capabilities, max_frame_size = await read_handshake_reply(reader, max_frame_size)
+
+    package_type, _, payload = await unpack_package(reader, max_payload_size=max_frame_size)
+    if package_type != PackageType.RESUME:
+        raise ProtocolError(f"Expected RESUME package, received {package_type}")
+
+    return version, capabilities, max_frame_size, unpack_resume(payload)[1]
@@ -4,6 +4,7 @@ from flet import Page, TextField, Dropdown, ElevatedButton, Container, Column, M
 
 from config_manager import ConfigurationManager
 from logger import Logger
+from tunnel_protocol import Capability, AuthFlag, AuthStatus, AuthenticationError, ProtocolError, client_handshake
 from ui.config_window import ConfigWindow
 
 
@@ -54,16 +55,15 @@ class LoginWindow:
     async def test_credentials(username: str, password: str, server_info: dict) -> str:
         try:
             reader, writer = await asyncio.wait_for(asyncio.open_connection(server_info["address"], server_info["port"]), timeout=2)
-            writer.write(f"__test__:{username}:{password}\n".encode())
-            await writer.drain()
-
-            response = await asyncio.wait_for(reader.read(10), timeout=2)
-
-            writer.close()
-            await writer.wait_closed()
-
-            return "valid" if bool(response) else "invalid"
-        except (asyncio.TimeoutError, ConnectionRefusedError, OSError):
+            try:
+                await asyncio.wait_for(client_handshake(reader, writer, username, password, Capability.NONE, flags=AuthFlag.TEST), timeout=2)
+                return "valid"
+            except AuthenticationError as error:
+                return "invalid" if error.status == AuthStatus.INVALID_CREDENTIALS else "unavailable"
+            finally:
+                writer.close()
+                await writer.wait_closed()
+        except (asyncio.TimeoutError, ConnectionRefusedError, OSError, ProtocolError):
             return "unavailable"
 
     async def handle_continue(self, event=None):
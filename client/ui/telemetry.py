@@ -0,0 +1,70 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+
+class Telemetry:
+    def __init__(self, render: Callable[["Telemetry"], None], refresh_rate: float = 4.0, max_lines: int = 200):
+        self.render = render
+        self.interval = 1.0 / refresh_rate
+        self.max_lines = max_lines
+        self.lines: Deque[Tuple[str, str]] = deque(maxlen=max_lines)
+        self.dropped_lines = 0
+        self.upload = 0
+        self.download = 0
+        self.ping: Optional[int] = None
+        self.address: Optional[str] = None
+        self.traffic_changed = False
+        self.ping_changed = False
+        self.address_changed = False
+        self.dirty = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def log(self, message: str, level: str) -> None:
+        if len(self.lines) == self.max_lines:
+            self.dropped_lines += 1
+        self.lines.append((time.strftime("[%H:%M:%S] ") + message, level))
+        self.dirty.set()
+
+    def traffic(self, upload: int, download: int) -> None:
+        self.upload, self.download = upload, download
+        self.traffic_changed = True
+        self.dirty.set()
+
+    def set_ping(self, milliseconds: Optional[int]) -> None:
+        self.ping = milliseconds
+        self.ping_changed = True
+        self.dirty.set()
+
+    def set_address(self, address: Optional[str]) -> None:
+        self.address = address
+        self.address_changed = True
+        self.dirty.set()
+
+    def take_lines(self) -> List[Tuple[str, str]]:
+        lines = list(self.lines)
+        self.lines.clear()
+        self.dropped_lines = 0
+        return lines
+
+    def start(self) -> asyncio.Task:
+        self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def run(self) -> None:
+        while True:
+            await self.dirty.wait()
+            self.flush()
+            await asyncio.sleep(self.interval)
+
+    def flush(self) -> None:
+        self.dirty.clear()
+        self.render(self)
+        self.traffic_changed = False
+        self.ping_changed = False
+        self.address_changed = False
+
+    def stop(self) -> None:
+        if self.task and not self.task.done():
+            self.task.cancel()
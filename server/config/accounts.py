@@ -0,0 +1,120 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import secrets
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .types import AccountConfig
+
+
+def encode(value: bytes) -> str:
+    return base64.b64encode(value).decode()
+
+
+def hash_password(password: str, n: int = 2 ** 14, r: int = 8, p: int = 1) -> str:
+    salt = secrets.token_bytes(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p)
+    return f"scrypt${n}${r}${p}${encode(salt)}${encode(digest)}"
+
+
+def parse_password_hash(password_hash: str) -> Tuple[str, List[int], bytes, bytes]:
+    scheme, *parameters = password_hash.split("$")
+    expected_length = {"scrypt": 5, "pbkdf2_sha256": 3}.get(scheme)
+    if expected_length is None:
+        raise ValueError(f"Unsupported password hash scheme: {scheme}")
+    if len(parameters) != expected_length:
+        raise ValueError(f"Malformed {scheme} password hash")
+
+    try:
+        return scheme, [int(value) for value in parameters[:-2]], base64.b64decode(parameters[-2], validate=True), base64.b64decode(parameters[-1], validate=True)
+    except ValueError as error:
+        raise ValueError(f"Malformed {scheme} password hash: {error}") from error
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    scheme, parameters, salt, expected = parse_password_hash(password_hash)
+
+    if scheme == "scrypt":
+        n, r, p = parameters
+        digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p + 1024 * 1024, dklen=len(expected))
+    else:
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, parameters[0], dklen=len(expected))
+
+    return hmac.compare_digest(digest, expected)
+
+
+def dummy_password_hash(password_hash: str) -> str:
+    scheme, parameters, salt, expected = parse_password_hash(password_hash)
+    return "$".join([scheme, *map(str, parameters), encode(secrets.token_bytes(len(salt))), encode(secrets.token_bytes(len(expected)))])
+
+
+class AccountIndex:
+    def __init__(self, accounts: List[AccountConfig], cache_size: int = 4096):
+        self.accounts: Dict[str, AccountConfig] = {}
+        self.cache: OrderedDict[str, Tuple[str, bytes]] = OrderedDict()
+        self.cache_size = cache_size
+        self.cache_key = secrets.token_bytes(32)
+        self.dummy_hash: Optional[str] = None
+
+        for account in accounts:
+            if account["login"] in self.accounts:
+                raise ValueError(f"Duplicate account login: {account["login"]}")
+            if "password_hash" in account:
+                parse_password_hash(account["password_hash"])
+                self.dummy_hash = self.dummy_hash or dummy_password_hash(account["password_hash"])
+            self.accounts[account["login"]] = account
+
+    def __contains__(self, login: str) -> bool:
+        return login in self.accounts
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+    def inherit(self, previous: "AccountIndex") -> None:
+        self.cache_key = previous.cache_key
+        for login, (password_hash, fingerprint) in previous.cache.items():
+            if self.accounts.get(login, {}).get("password_hash") == password_hash:
+                self.cache[login] = (password_hash, fingerprint)
+
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def fingerprint(self, login: str, password: str) -> bytes:
+        return hmac.new(self.cache_key, f"{login}\0{password}".encode(), hashlib.sha256).digest()
+
+    def cached(self, login: str, password_hash: str, fingerprint: bytes) -> bool:
+        entry = self.cache.get(login)
+        if entry is None or entry[0] != password_hash or not hmac.compare_digest(entry[1], fingerprint):
+            return False
+
+        self.cache.move_to_end(login)
+        return True
+
+    def remember(self, login: str, password_hash: str, fingerprint: bytes) -> None:
+        self.cache[login] = (password_hash, fingerprint)
+        self.cache.move_to_end(login)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    async def verify(self, login: str, password: str) -> bool:
+        account: Optional[AccountConfig] = self.accounts.get(login)
+        if account is None:
+            if self.dummy_hash:
+                await asyncio.get_running_loop().run_in_executor(None, verify_password, password, self.dummy_hash)
+            return False
+
+        if "password_hash" not in account:
+            return hmac.compare_digest(account["password"].encode(), password.encode())
+
+        password_hash = account["password_hash"]
+        fingerprint = self.fingerprint(login, password)
+        if self.cached(login, password_hash, fingerprint):
+            return True
+
+        if not await asyncio.get_running_loop().run_in_executor(None, verify_password, password, password_hash):
+            return False
+
+        self.remember(login, password_hash, fingerprint)
+        return True
@@ -3,6 +3,7 @@ import json
 import logging
 from typing import Dict, Any
 
+from .accounts import AccountIndex
 from .types import Config
 
 
@@ -10,11 +11,20 @@ def load_config(file_path: str = "config.json") -> Config:
     default_config: Config = {
         "host": "0.0.0.0",
         "port": 13882,
+        "engine": "streams",
+        "workers": 1,
+        "event_loop": "auto",
+        "reload_interval": 2.0,
         "allowed_port_range": [1024, 65535],
         "accounts": [],
-        "timeouts": {"auth": 3.0, "read": 5.0, "write": 5.0},
-        "limits": {"max_auth_size": 1024, "max_data_size": 65536, "queue_size": 1000},
-        "logging": {"level": "INFO", "file": "logs.txt"}
+        "timeouts": {"auth": 3.0, "write": 5.0, "idle": 30.0, "connection": 0},
+        "limits": {"max_auth_size": 1024, "max_data_size": 65536, "queue_size": 1000, "window_size": 262144, "backlog": 128, "auth_cache_size": 4096, "max_bindings": 8, "max_lanes": 4},
+        "sockets": {"control": {"nodelay": True, "rcvbuf": 0, "sndbuf": 0}, "visitor": {"nodelay": True, "rcvbuf": 0, "sndbuf": 0}},
+        "compression": {"enabled": True, "level": 6, "min_size": 512, "offload_threshold": 16384},
+        "sessions": {"resumable": True, "grace_period": 30.0},
+        "metrics": {"enabled": False, "host": "127.0.0.1", "port": 9108},
+        "ports": {"cooldown": 30.0, "reservation": 300.0, "bind_attempts": 5},
+        "logging": {"level": "INFO", "file": "logs.txt", "format": "text", "rate_limit": 20.0, "burst": 100}
     }
 
     try:
@@ -38,18 +48,59 @@ def load_config(file_path: str = "config.json") -> Config:
         raise ValueError("Accounts list cannot be empty")
     if not (0 < config["port"] <= 65535):
         raise ValueError("Port must be in range 1-65535")
+    if config["engine"] not in {"streams", "protocol"}:
+        raise ValueError("Engine must be either streams or protocol")
+    if not isinstance(config["workers"], int) or config["workers"] <= 0:
+        raise ValueError("Workers must be a positive integer")
+    if config["event_loop"] not in {"auto", "asyncio", "uvloop"}:
+        raise ValueError("Event loop must be one of auto, asyncio or uvloop")
+    if not isinstance(config["reload_interval"], (int, float)) or config["reload_interval"] < 0:
+        raise ValueError("Reload interval must be a non-negative number")
     if not (0 < config["allowed_port_range"][0] <= config["allowed_port_range"][1] <= 65535):
         raise ValueError("Invalid port range")
     for account in config["accounts"]:
-        if not (account.get("login") and account.get("password")):
-            raise ValueError("Each account must contain login and password")
-    for timeout in config["timeouts"].values():
-        if not isinstance(timeout, (int, float)) or timeout <= 0:
-            raise ValueError("Timeouts must be positive numbers")
+        if not (isinstance(account, dict) and account.get("login") and (account.get("password") or account.get("password_hash"))):
+            raise ValueError("Each account must contain login and password or password_hash")
+    for key, timeout in config["timeouts"].items():
+        if not isinstance(timeout, (int, float)) or timeout < 0 or (timeout == 0 and key != "connection"):
+            raise ValueError("Timeouts must be positive numbers, connection may be 0 to disable it")
     for limit in config["limits"].values():
         if not isinstance(limit, int) or limit <= 0:
             raise ValueError("Limits must be positive integers")
+    if config["limits"]["window_size"] < config["limits"]["max_data_size"]:
+        raise ValueError("Window size cannot be smaller than max data size")
+    for options in config["sockets"].values():
+        if not isinstance(options.get("nodelay", True), bool):
+            raise ValueError("Socket nodelay option must be a boolean")
+        if not all(isinstance(options.get(key, 0), int) and options.get(key, 0) >= 0 for key in ("rcvbuf", "sndbuf")):
+            raise ValueError("Socket buffer sizes must be non-negative integers")
+    if not isinstance(config["compression"]["enabled"], bool):
+        raise ValueError("Compression enabled flag must be a boolean")
+    if not isinstance(config["compression"]["level"], int) or not (1 <= config["compression"]["level"] <= 9):
+        raise ValueError("Compression level must be an integer in range 1-9")
+    if not all(isinstance(config["compression"][key], int) and config["compression"][key] >= 0 for key in ("min_size", "offload_threshold")):
+        raise ValueError("Compression sizes must be non-negative integers")
+    if not isinstance(config["sessions"]["resumable"], bool):
+        raise ValueError("Session resumable flag must be a boolean")
+    if not isinstance(config["sessions"]["grace_period"], (int, float)) or config["sessions"]["grace_period"] <= 0:
+        raise ValueError("Session grace period must be a positive number")
+    if not isinstance(config["metrics"]["enabled"], bool):
+        raise ValueError("Metrics enabled flag must be a boolean")
+    if not isinstance(config["metrics"]["port"], int) or not (0 < config["metrics"]["port"] <= 65535):
+        raise ValueError("Metrics port must be in range 1-65535")
+    if not all(isinstance(config["ports"][key], (int, float)) and config["ports"][key] >= 0 for key in ("cooldown", "reservation")):
+        raise ValueError("Port cooldown and reservation must be non-negative numbers")
+    if not isinstance(config["ports"]["bind_attempts"], int) or config["ports"]["bind_attempts"] <= 0:
+        raise ValueError("Port bind attempts must be a positive integer")
     if config["logging"]["level"] not in {"DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"}:
         raise ValueError("Invalid logging level")
+    if config["logging"]["format"] not in {"text", "json"}:
+        raise ValueError("Logging format must be either text or json")
+    if not isinstance(config["logging"]["rate_limit"], (int, float)) or config["logging"]["rate_limit"] < 0:
+        raise ValueError("Logging rate limit must be a non-negative number")
+    if not isinstance(config["logging"]["burst"], int) or config["logging"]["burst"] <= 0:
+        raise ValueError("Logging burst must be a positive integer")
+
+    config["account_index"] = AccountIndex(config["accounts"], config["limits"]["auth_cache_size"])
 
     return config
@@ -1,34 +1,85 @@
-from typing import TypedDict, List
+from typing import TYPE_CHECKING, TypedDict, List, NotRequired
+
+if TYPE_CHECKING:
+    from .accounts import AccountIndex
 
 
 class TimeoutConfig(TypedDict):
     auth: float
-    read: float
     write: float
+    idle: float
     connection: float
 
 class LimitConfig(TypedDict):
     max_auth_size: int
     max_data_size: int
     queue_size: int
+    window_size: int
+    backlog: int
+    auth_cache_size: int
+    max_bindings: int
+    max_lanes: int
+
+class SocketOptions(TypedDict):
+    nodelay: bool
+    rcvbuf: int
+    sndbuf: int
+
+class SocketConfig(TypedDict):
+    control: SocketOptions
+    visitor: SocketOptions
+
+class CompressionConfig(TypedDict):
+    enabled: bool
+    level: int
+    min_size: int
+    offload_threshold: int
+
+class SessionConfig(TypedDict):
+    resumable: bool
+    grace_period: float
+
+class MetricsConfig(TypedDict):
+    enabled: bool
+    host: str
+    port: int
+
+class PortConfig(TypedDict):
+    cooldown: float
+    reservation: float
+    bind_attempts: int
 
 class LoggingConfig(TypedDict):
     level: str
     file: str
+    format: str
+    rate_limit: float
+    burst: int
 
 class SecurityConfig(TypedDict):
     allow_test_mode: bool
 
 class AccountConfig(TypedDict):
     login: str
-    password: str
+    password: NotRequired[str]
+    password_hash: NotRequired[str]
 
 class Config(TypedDict):
     host: str
     port: int
+    engine: str
+    workers: int
+    event_loop: str
+    reload_interval: float
     allowed_port_range: List[int]
     accounts: List[AccountConfig]
+    account_index: "AccountIndex"
     timeouts: TimeoutConfig
     limits: LimitConfig
+    sockets: SocketConfig
+    compression: CompressionConfig
+    sessions: SessionConfig
+    metrics: MetricsConfig
+    ports: PortConfig
     logging: LoggingConfig
     security: SecurityConfig
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import os
+import signal
+from typing import Optional
+
+from .config import load_config
+from .types import Config
+
+RELOADABLE_SECTIONS = ("timeouts", "limits", "sockets", "compression", "sessions")
+RESTART_KEYS = ("host", "port", "engine", "workers", "event_loop", "allowed_port_range", "ports", "logging", "reload_interval", "metrics")
+
+
+class ConfigWatcher:
+    def __init__(self, config: Config, file_path: str = "config.json"):
+        self.config = config
+        self.file_path = file_path
+        self.mtime = self.stat()
+        self.lock = asyncio.Lock()
+        self.task: Optional[asyncio.Task] = None
+        self.logger = logging.getLogger(__name__)
+
+    def stat(self) -> Optional[int]:
+        try:
+            return os.stat(self.file_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if hasattr(signal, "SIGHUP"):
+            try:
+                loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(self.reload()))
+            except NotImplementedError:
+                pass
+
+        if self.config["reload_interval"] > 0:
+            self.task = asyncio.create_task(self.run())
+
+    def stop(self) -> None:
+        if hasattr(signal, "SIGHUP"):
+            try:
+                asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.config["reload_interval"])
+            if self.stat() != self.mtime:
+                await self.reload()
+
+    async def reload(self) -> bool:
+        async with self.lock:
+            self.mtime = self.stat()
+            try:
+                config = await asyncio.get_running_loop().run_in_executor(None, load_config, self.file_path)
+            except (RuntimeError, ValueError, KeyError, TypeError) as error:
+                self.logger.error(f"Configuration reload rejected, keeping current settings: {error}", extra={"client_ip": "server"})
+                return False
+
+            self.apply(config)
+            return True
+
+    def apply(self, config: Config) -> None:
+        for key in RESTART_KEYS:
+            if config[key] != self.config[key]:
+                self.logger.warning(f"Configuration key {key} changed, restart required to apply it.", extra={"client_ip": "server"})
+
+        config["account_index"].inherit(self.config["account_index"])
+        added = len(config["account_index"].accounts.keys() - self.config["account_index"].accounts.keys())
+        removed = len(self.config["account_index"].accounts.keys() - config["account_index"].accounts.keys())
+
+        self.config["accounts"] = config["accounts"]
+        self.config["account_index"] = config["account_index"]
+        for section in RELOADABLE_SECTIONS:
+            self.config[section].update(config[section])
+
+        self.logger.info(f"Configuration reloaded: {len(config["accounts"])} accounts (+{added}/-{removed}).", extra={"client_ip": "server"})
@@ -0,0 +1,20 @@
+import argparse
+import getpass
+
+from config.accounts import hash_password
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a password_hash entry for config.json")
+    parser.add_argument("--n", type=int, default=2 ** 14, help="scrypt CPU/memory cost")
+    arguments = parser.parse_args()
+
+    password = getpass.getpass("Password: ")
+    if password != getpass.getpass("Repeat password: "):
+        raise SystemExit("Passwords do not match")
+
+    print(hash_password(password, n=arguments.n))
+
+
+if __name__ == "__main__":
+    main()
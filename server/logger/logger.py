@@ -1,8 +1,16 @@
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Any, List, MutableMapping, Optional, Tuple
 
 from config.types import Config
+from protocol.tunnel_protocol import DeferredQueueHandler, RateLimitFilter
+
+STRUCTURED_FIELDS = ("session", "login", "connection_id", "remote_port", "bytes_in", "bytes_out", "duration")
 
 
 class SafeFormatter(logging.Formatter):
@@ -10,21 +18,90 @@ class SafeFormatter(logging.Formatter):
         record.__dict__.setdefault("client_ip", "-")
         return super().format(record)
 
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "client_ip": record.__dict__.get("client_ip", "-"),
+            "message": record.getMessage()
+        }
+
+        for field in STRUCTURED_FIELDS:
+            value = record.__dict__.get(field)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+class SessionLoggerAdapter(logging.LoggerAdapter):
+    def __init__(self, logger: logging.Logger, session: Any):
+        super().__init__(logger, {})
+        self.session = session
+
+    def process(self, msg: Any, kwargs: MutableMapping[str, Any]) -> Tuple[Any, MutableMapping[str, Any]]:
+        kwargs["extra"] = {"client_ip": self.session.client_ip, "session": self.session.session_id, "login": self.session.login, **kwargs.get("extra", {})}
+        return msg, kwargs
+
+
+queue_handler: Optional[DeferredQueueHandler] = None
+listener: Optional[QueueListener] = None
+
 
 def setup_logging(logging_config: Config["logging"]) -> None:
-    log_file = Path(logging_config["file"])
-    if log_file.exists():
-        log_file.unlink()
+    global queue_handler
 
-    formatter = SafeFormatter(
+    formatter = JsonFormatter() if logging_config["format"] == "json" else SafeFormatter(
         fmt="%(asctime)s [%(levelname)s] [%(client_ip)s] %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S"
     )
 
-    file_handler = RotatingFileHandler(log_file, maxBytes=10_000_000, backupCount=5, encoding="utf-8")
-    file_handler.setFormatter(formatter)
+    file_handler = open_log_file(Path(logging_config["file"]), formatter)
 
     stream_handler = logging.StreamHandler()
     stream_handler.setFormatter(formatter)
 
-    logging.basicConfig(level=getattr(logging, logging_config["level"]), handlers=[file_handler, stream_handler])
+    queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(RateLimitFilter(logging_config["rate_limit"], logging_config["burst"]))
+
+    logging.basicConfig(level=getattr(logging, logging_config["level"]), handlers=[queue_handler])
+    start_listener([file_handler, stream_handler])
+    atexit.register(stop_logging)
+
+def open_log_file(log_file: Path, formatter: logging.Formatter) -> RotatingFileHandler:
+    log_file.unlink(missing_ok=True)
+
+    file_handler = RotatingFileHandler(log_file, maxBytes=10_000_000, backupCount=5, encoding="utf-8")
+    file_handler.setFormatter(formatter)
+    return file_handler
+
+def start_listener(handlers: List[logging.Handler]) -> None:
+    global listener
+
+    listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+
+def restart_logging(worker: Optional[int] = None) -> None:
+    if queue_handler is None or listener is None:
+        return
+
+    handlers = list(listener.handlers)
+    if worker is not None:
+        for index, handler in enumerate(handlers):
+            if isinstance(handler, RotatingFileHandler):
+                handler.close()
+                log_file = Path(handler.baseFilename)
+                handlers[index] = open_log_file(log_file.with_name(f"{log_file.stem}-w{worker}{log_file.suffix}"), handler.formatter)
+
+    queue_handler.queue = queue.SimpleQueue()
+    start_listener(handlers)
+
+def stop_logging() -> None:
+    global listener
+
+    if listener is not None:
+        listener.stop()
+        listener = None
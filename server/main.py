@@ -1,21 +1,45 @@
+import argparse
 import asyncio
 import logging
+import multiprocessing
+import os
+import signal
+import socket
+import tempfile
+from pathlib import Path
+from typing import List, Union
 
 from config.config import load_config
-from logger.logger import setup_logging
+from config.types import Config
+from config.watcher import ConfigWatcher
+from logger.logger import setup_logging, restart_logging, stop_logging
+from ports.coordinator import PortCoordinator, RemotePortPool
+from ports.pool import PortPool
+from protocol.tunnel_protocol import install_event_loop, describe_event_loop
 from server.server import start_server, shutdown as server_shutdown
 
 
-async def main():
-    config = load_config()
-    setup_logging(config["logging"])
+def create_port_pool(config: Config) -> PortPool:
+    return PortPool(config["allowed_port_range"], config["ports"]["cooldown"], config["ports"]["reservation"])
+
 
+async def serve(config: Config, port_pool: Union[PortPool, RemotePortPool], reuse_port: bool = False, worker: int = 0) -> None:
     shutdown_event = asyncio.Event()
     clients_lock = asyncio.Lock()
     clients = {}
-    used_ports = set()
 
-    server_task = asyncio.create_task(start_server(config, shutdown_event, clients_lock, clients, used_ports))
+    logging.getLogger(__name__).info(f"Using {describe_event_loop()} event loop.", extra={"client_ip": "server"})
+
+    if hasattr(signal, "SIGTERM"):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, shutdown_event.set)
+        except NotImplementedError:
+            pass
+
+    watcher = ConfigWatcher(config)
+    watcher.start()
+
+    server_task = asyncio.create_task(start_server(config, shutdown_event, clients_lock, clients, port_pool, reuse_port, worker))
 
     try:
         await server_task
@@ -23,9 +47,100 @@ async def main():
         logging.getLogger(__name__).info("Received KeyboardInterrupt, shutting down.", extra={"client_ip": "server"})
         shutdown_event.set()
     finally:
+        watcher.stop()
         await server_shutdown(asyncio.get_running_loop())
         logging.getLogger(__name__).debug("Shutdown complete. Exiting.", extra={"client_ip": "server"})
 
 
+def run_worker(config: Config, coordinator_socket: socket.socket, coordinator_path: str, index: int) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    coordinator_socket.close()
+    restart_logging(index)
+
+    try:
+        asyncio.run(serve(config, RemotePortPool(coordinator_path), reuse_port=True, worker=index))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_logging()
+
+
+def forward_reload(workers: List[multiprocessing.Process]) -> None:
+    for worker in workers:
+        if worker.is_alive():
+            os.kill(worker.pid, signal.SIGHUP)
+
+
+async def coordinate(config: Config, coordinator_socket: socket.socket, workers: List[multiprocessing.Process]) -> None:
+    logger = logging.getLogger(__name__)
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, stop_event.set)
+    loop.add_signal_handler(signal.SIGHUP, forward_reload, workers)
+
+    coordinator = PortCoordinator(create_port_pool(config), coordinator_socket)
+    await coordinator.start()
+    logger.info(f"Port coordinator running for {len(workers)} workers.", extra={"client_ip": "server"})
+
+    while not stop_event.is_set():
+        if not any(worker.is_alive() for worker in workers):
+            logger.critical("All workers exited, shutting down.", extra={"client_ip": "server"})
+            break
+
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+
+    for worker in workers:
+        if worker.is_alive():
+            worker.terminate()
+    for worker in workers:
+        await loop.run_in_executor(None, worker.join, 10.0)
+
+    await coordinator.close()
+    logger.debug("Shutdown complete. Exiting.", extra={"client_ip": "server"})
+
+
+def run_workers(config: Config, count: int) -> None:
+    if not hasattr(socket, "SO_REUSEPORT") or "fork" not in multiprocessing.get_all_start_methods():
+        raise RuntimeError("Multiple workers require SO_REUSEPORT and fork support")
+
+    coordinator_path = Path(tempfile.gettempdir()) / f"nigarok-{os.getpid()}.sock"
+    coordinator_path.unlink(missing_ok=True)
+
+    coordinator_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    coordinator_socket.bind(str(coordinator_path))
+    coordinator_socket.listen()
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=run_worker, args=(config, coordinator_socket, str(coordinator_path), index), name=f"worker-{index}") for index in range(count)]
+    for worker in workers:
+        worker.start()
+
+    try:
+        asyncio.run(coordinate(config, coordinator_socket, workers))
+    finally:
+        coordinator_path.unlink(missing_ok=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Nigarok tunnel server")
+    parser.add_argument("--workers", type=int, help="number of worker processes sharing the control port")
+    arguments = parser.parse_args()
+
+    config = load_config()
+    setup_logging(config["logging"])
+    install_event_loop(config["event_loop"])
+
+    workers = arguments.workers or config["workers"]
+    if workers > 1:
+        run_workers(config, workers)
+    else:
+        asyncio.run(serve(config, create_port_pool(config)))
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
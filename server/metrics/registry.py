@@ -0,0 +1,169 @@
+import asyncio
+import bisect
+import logging
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from ports.coordinator import RemotePortPool
+from ports.pool import PortPool
+from protocol.tunnel_protocol import PackageType, FrameStats, COMPRESSION_STATS
+
+AUTH_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+PORT_GAUGES = ("size", "used", "free", "cooling", "reserved", "utilization")
+PORT_COUNTERS = ("allocations", "releases", "reuses", "exhaustions", "bind_failures")
+
+
+def format_labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ""
+
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f"{key}=\"{value}\"" for key, value in zip(labels, escaped)) + "}"
+
+
+class Histogram:
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def samples(self, name: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{format_labels({"le": "+Inf" if bound == float("inf") else bound})} {cumulative}")
+
+        lines.append(f"{name}_sum {self.sum}")
+        lines.append(f"{name}_count {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self, port_pool: Union[PortPool, RemotePortPool], lag_interval: float = 1.0):
+        self.port_pool = port_pool
+        self.lag_interval = lag_interval
+        self.tunnels: Set = set()
+        self.retired = FrameStats()
+        self.auth_duration = Histogram(AUTH_BUCKETS)
+        self.auth_results = {"success": 0, "failure": 0}
+        self.loop_lag = 0.0
+        self.max_loop_lag = 0.0
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.task: Optional[asyncio.Task] = None
+        self.logger = logging.getLogger(__name__)
+
+    def register(self, handler) -> None:
+        self.tunnels.add(handler)
+
+    def unregister(self, handler) -> None:
+        if handler in self.tunnels:
+            self.tunnels.discard(handler)
+            self.retired.merge(handler.stats)
+
+    def observe_auth(self, duration: float, success: bool) -> None:
+        self.auth_duration.observe(duration)
+        self.auth_results["success" if success else "failure"] += 1
+
+    async def start(self, host: str, port: int) -> None:
+        self.task = asyncio.create_task(self.monitor_loop())
+        self.server = await asyncio.start_server(self.handle_request, host, port)
+        self.logger.info(f"Metrics available at http://{host}:{port}/metrics.", extra={"client_ip": "server"})
+
+    async def close(self) -> None:
+        if self.task:
+            self.task.cancel()
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def monitor_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            self.loop_lag = max(0.0, loop.time() - started - self.lag_interval)
+            self.max_loop_lag = max(self.max_loop_lag, self.loop_lag)
+
+    async def handle_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5.0)
+            method, path, _ = request.split(b"\r\n", 1)[0].decode("latin-1").split(" ", 2)
+
+            if path.partition("?")[0] != "/metrics":
+                status, body = "404 Not Found", b"Not found\n"
+            elif method != "GET":
+                status, body = "405 Method Not Allowed", b"Method not allowed\n"
+            else:
+                status, body = "200 OK", (await self.render()).encode()
+
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, ConnectionResetError, OSError) as error:
+            self.logger.debug(f"Metrics request failed: {error}", extra={"client_ip": "server"})
+        finally:
+            writer.close()
+
+    async def render(self) -> str:
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, description: str, samples: List[Tuple[Dict[str, object], float]]) -> None:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{format_labels(labels)} {value}" for labels, value in samples)
+
+        tunnels = [handler for handler in self.tunnels if handler.running]
+        totals = FrameStats()
+        totals.merge(self.retired)
+        visitors: Dict[str, int] = {}
+        queues: Dict[str, int] = {}
+        for handler in tunnels:
+            totals.merge(handler.stats)
+            visitors[handler.login] = visitors.get(handler.login, 0) + len(handler.connection_map)
+            queues[handler.login] = queues.get(handler.login, 0) + sum(lane.queue_depth for lane in handler.lanes)
+
+        metric("nigarok_tunnels_active", "gauge", "Authenticated tunnels currently open.", [({}, len(tunnels))])
+        metric("nigarok_visitor_connections", "gauge", "Visitor connections currently open per login.", [({"login": login}, count) for login, count in visitors.items()])
+        metric("nigarok_frame_queue_depth", "gauge", "Frames queued for the control connections per login.", [({"login": login}, depth) for login, depth in queues.items()])
+        metric("nigarok_tunnel_bytes_total", "counter", "Control connection bytes per open tunnel.", [sample for handler in tunnels for sample in (
+            ({"login": handler.login, "port": handler.remote_ports[0] if handler.remote_ports else "", "direction": "in"}, handler.stats.bytes_received),
+            ({"login": handler.login, "port": handler.remote_ports[0] if handler.remote_ports else "", "direction": "out"}, handler.stats.bytes_sent)
+        )])
+        metric("nigarok_bytes_total", "counter", "Control connection bytes across all tunnels.", [({"direction": "in"}, totals.bytes_received), ({"direction": "out"}, totals.bytes_sent)])
+        metric("nigarok_frames_total", "counter", "Frames by package type and direction.", [sample for package_type in PackageType for sample in (
+            ({"type": package_type.name, "direction": "in"}, totals.frames_received[package_type]),
+            ({"type": package_type.name, "direction": "out"}, totals.frames_sent[package_type])
+        )])
+
+        lines.append("# HELP nigarok_drain_wait_seconds Time spent waiting for control connection writes to drain.")
+        lines.append("# TYPE nigarok_drain_wait_seconds summary")
+        lines.append(f"nigarok_drain_wait_seconds_sum {totals.drain_time}")
+        lines.append(f"nigarok_drain_wait_seconds_count {totals.drains}")
+
+        lines.append("# HELP nigarok_auth_duration_seconds Credential verification time.")
+        lines.append("# TYPE nigarok_auth_duration_seconds histogram")
+        lines.extend(self.auth_duration.samples("nigarok_auth_duration_seconds"))
+        metric("nigarok_auth_total", "counter", "Credential verifications by result.", [({"result": result}, count) for result, count in self.auth_results.items()])
+
+        try:
+            ports = await self.port_pool.stats()
+        except RuntimeError as error:
+            self.logger.warning(f"Port pool statistics unavailable: {error}", extra={"client_ip": "server"})
+        else:
+            for key in PORT_GAUGES:
+                metric(f"nigarok_port_pool_{key}", "gauge", f"Port pool {key.replace("_", " ")}.", [({}, ports[key])])
+            for key in PORT_COUNTERS:
+                metric(f"nigarok_port_pool_{key}_total", "counter", f"Port pool {key.replace("_", " ")}.", [({}, ports[key])])
+
+        compression = COMPRESSION_STATS.snapshot()
+        for key in ("bytes_in", "bytes_out", "bytes_decompressed", "skipped_bytes", "disabled_streams"):
+            metric(f"nigarok_compression_{key}_total", "counter", f"Compression {key.replace("_", " ")}.", [({}, compression[key])])
+        for key in ("compress_time", "decompress_time"):
+            metric(f"nigarok_compression_{key}_seconds_total", "counter", f"Compression {key.replace("_", " ")}.", [({}, compression[key])])
+
+        metric("nigarok_event_loop_lag_seconds", "gauge", "Event loop lag measured on the last interval.", [({}, self.loop_lag)])
+        metric("nigarok_event_loop_lag_max_seconds", "gauge", "Largest event loop lag observed.", [({}, self.max_loop_lag)])
+
+        return "\n".join(lines) + "\n"
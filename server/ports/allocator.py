@@ -0,0 +1,120 @@
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+FREE = 0
+USED = 1
+COOLING = 2
+RESERVED = 3
+
+
+class PortAllocator:
+    def __init__(self, port_range: List[int], cooldown: float = 30.0, reservation: float = 300.0):
+        self.first_port, self.last_port = port_range
+        self.size = self.last_port - self.first_port + 1
+        self.cooldown = cooldown
+        self.reservation = reservation
+
+        self.states = bytearray(self.size)
+        ports = list(range(self.first_port, self.last_port + 1))
+        random.shuffle(ports)
+        self.free: Deque[int] = deque(ports)
+        self.cooling: Deque[Tuple[float, int]] = deque()
+        self.reserved: Deque[Tuple[float, str, int]] = deque()
+        self.reservations: Dict[str, Tuple[int, float]] = {}
+
+        self.used = 0
+        self.allocations = 0
+        self.releases = 0
+        self.reuses = 0
+        self.exhaustions = 0
+        self.failures = 0
+
+    def state(self, port: int) -> int:
+        return self.states[port - self.first_port]
+
+    def set_state(self, port: int, state: int) -> None:
+        self.states[port - self.first_port] = state
+
+    def reclaim(self, now: float) -> None:
+        while self.cooling and self.cooling[0][0] <= now:
+            port = self.cooling.popleft()[1]
+            self.set_state(port, FREE)
+            self.free.append(port)
+
+        while self.reserved and self.reserved[0][0] <= now:
+            port = self.expire_reservation()
+            if port is not None:
+                self.set_state(port, FREE)
+                self.free.append(port)
+
+    def expire_reservation(self) -> Optional[int]:
+        expires, login, port = self.reserved.popleft()
+        if self.reservations.get(login) != (port, expires):
+            return None
+
+        del self.reservations[login]
+        return port
+
+    def allocate(self, login: Optional[str] = None) -> int:
+        self.reclaim(time.monotonic())
+
+        port, _ = self.reservations.pop(login, (None, 0.0)) if login else (None, 0.0)
+        if port is not None:
+            self.reuses += 1
+        elif self.free:
+            port = self.free.popleft()
+        elif self.cooling:
+            port = self.cooling.popleft()[1]
+        else:
+            while self.reserved and port is None:
+                port = self.expire_reservation()
+
+        if port is None:
+            self.exhaustions += 1
+            raise RuntimeError(f"Port range {self.first_port}-{self.last_port} exhausted")
+
+        self.set_state(port, USED)
+        self.used += 1
+        self.allocations += 1
+        return port
+
+    def release(self, port: int, login: Optional[str] = None, failed: bool = False) -> None:
+        if not (self.first_port <= port <= self.last_port) or self.state(port) != USED:
+            return
+
+        now = time.monotonic()
+        self.used -= 1
+        self.releases += 1
+
+        if failed:
+            self.failures += 1
+        elif login and self.reservation > 0:
+            previous, _ = self.reservations.get(login, (None, 0.0))
+            if previous is not None:
+                self.set_state(previous, COOLING)
+                self.cooling.append((now + self.cooldown, previous))
+
+            self.reservations[login] = (port, now + self.reservation)
+            self.reserved.append((now + self.reservation, login, port))
+            self.set_state(port, RESERVED)
+            return
+
+        self.set_state(port, COOLING)
+        self.cooling.append((now + self.cooldown, port))
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "size": self.size,
+            "used": self.used,
+            "free": len(self.free),
+            "cooling": len(self.cooling),
+            "reserved": len(self.reservations),
+            "utilization": self.used / self.size,
+            "allocations": self.allocations,
+            "releases": self.releases,
+            "reuses": self.reuses,
+            "exhaustions": self.exhaustions,
+            "bind_failures": self.failures
+        }
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import logging
+import socket
+from typing import Dict, Optional
+
+from .pool import PortPool
+
+
+class PortCoordinator:
+    def __init__(self, pool: PortPool, sock: socket.socket):
+        self.pool = pool
+        self.sock = sock
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.logger = logging.getLogger(__name__)
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_unix_server(self.handle_worker, sock=self.sock)
+
+    async def close(self) -> None:
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        owned_ports: Dict[int, Optional[str]] = {}
+
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    command = request["command"]
+                    if command == "ALLOCATE":
+                        login = request.get("login")
+                        port = await self.pool.allocate(login)
+                        owned_ports[port] = login
+                        response = f"OK {port}"
+                    elif command == "RELEASE":
+                        port = int(request["port"])
+                        login = request.get("login")
+                        owned_ports.pop(port, None)
+                        await self.pool.release(port, login, bool(request.get("failed")))
+                        response = "OK"
+                    elif command == "STATS":
+                        response = f"OK {json.dumps(await self.pool.stats())}"
+                    else:
+                        response = f"ERROR Unknown command: {command}"
+                except (RuntimeError, ValueError, KeyError, TypeError) as error:
+                    response = f"ERROR {error}"
+
+                writer.write(f"{response}\n".encode())
+                await writer.drain()
+        except (ConnectionResetError, OSError) as error:
+            self.logger.warning(f"Worker connection to port coordinator lost: {error}", extra={"client_ip": "server"})
+        finally:
+            for port, login in owned_ports.items():
+                await self.pool.release(port, login)
+
+            writer.close()
+
+class RemotePortPool:
+    def __init__(self, path: str):
+        self.path = path
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.lock = asyncio.Lock()
+
+    async def request(self, command: str, **arguments) -> str:
+        async with self.lock:
+            try:
+                if self.writer is None or self.writer.is_closing():
+                    self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+
+                self.writer.write(json.dumps({"command": command, **arguments}).encode() + b"\n")
+                await self.writer.drain()
+                line = await self.reader.readline()
+            except (ConnectionResetError, OSError) as error:
+                self.writer = None
+                raise RuntimeError(f"Port coordinator unavailable: {error}") from error
+
+            if not line:
+                self.writer = None
+                raise RuntimeError("Port coordinator closed the connection")
+
+            status, _, value = line.decode().strip().partition(" ")
+            if status != "OK":
+                raise RuntimeError(value)
+
+            return value
+
+    async def allocate(self, login: Optional[str] = None) -> int:
+        return int(await self.request("ALLOCATE", login=login))
+
+    async def release(self, port: int, login: Optional[str] = None, failed: bool = False) -> None:
+        await self.request("RELEASE", port=port, login=login, failed=failed)
+
+    async def stats(self) -> Dict[str, float]:
+        return json.loads(await self.request("STATS"))
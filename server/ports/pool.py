@@ -0,0 +1,18 @@
+from typing import Dict, List, Optional
+
+from .allocator import PortAllocator
+
+
+class PortPool:
+    def __init__(self, port_range: List[int], cooldown: float = 30.0, reservation: float = 300.0):
+        self.port_range = port_range
+        self.allocator = PortAllocator(port_range, cooldown, reservation)
+
+    async def allocate(self, login: Optional[str] = None) -> int:
+        return self.allocator.allocate(login)
+
+    async def release(self, port: int, login: Optional[str] = None, failed: bool = False) -> None:
+        self.allocator.release(port, login, failed)
+
+    async def stats(self) -> Dict[str, float]:
+        return self.allocator.stats()
@@ -1,42 +1,103 @@
 import asyncio
 import socket
 import random
+import secrets
 import logging
-from typing import Dict, Optional, List
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, List, Tuple, Union
 
 from config.types import Config
-from protocol.tunnel_protocol import PackageType, pack_package, unpack_package, ProtocolError
+from logger.logger import SessionLoggerAdapter
+from metrics.registry import MetricsRegistry
+from ports.coordinator import RemotePortPool
+from ports.pool import PortPool
+from protocol.tunnel_protocol import PackageType, Capability, AuthFlag, AuthStatus, FrameWriter, TunnelStream, FrameStats, pack_package, unpack_package, pack_window_update, unpack_window_update, pack_hello, unpack_hello, unpack_auth, pack_auth_result, pack_new_connection, pack_session, unpack_join, unpack_resume, pack_resume, resume_entries, resume_streams, ReplayBuffer, ResumeFlag, ProtocolError, StreamCompressor, StreamDecompressor, configure_socket, PROTOCOL_VERSION, UNLIMITED_WINDOW, DEFAULT_BATCH_SIZE, COMPRESSION_HEADROOM, SESSION_TOKEN_SIZE, HEADER_SIZE
+from .timeouts import IdleTimer, TimeoutWheel
+from .visitor import VisitorProtocol
+
+SERVER_CAPABILITIES = Capability.WINDOWING | Capability.BATCHING | Capability.BINDINGS | Capability.STRIPING | Capability.RESUMPTION
 
 
 class TunnelClientHandler:
-    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, config: Config, clients_lock: asyncio.Lock, clients: Dict, used_ports: set):
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, config: Config, clients_lock: asyncio.Lock, clients: Dict, port_pool: Union[PortPool, RemotePortPool], timeouts: TimeoutWheel, metrics: MetricsRegistry):
         self.reader = reader
         self.writer = writer
         self.config = config
         self.clients_lock = clients_lock
         self.clients = clients
-        self.used_ports = used_ports
+        self.port_pool = port_pool
+        self.timeouts = timeouts
+        self.metrics = metrics
+        self.stats = FrameStats()
+        self.idle_timer: Optional[IdleTimer] = None
         self.sock = writer.get_extra_info("socket")
+        configure_socket(self.sock, config["sockets"]["control"])
         self.client_ip = self.sock.getpeername()[0] if self.sock else "unknown"
-        self.connection_map: Dict[int, asyncio.StreamWriter] = {}
-        self.lock = asyncio.Lock()
-        self.remote_port: Optional[int] = None
+        self.connection_map: Dict[int, Union[TunnelStream, VisitorProtocol]] = {}
+        self.frames: Optional[FrameWriter] = None
+        self.lanes: List[FrameWriter] = []
+        self.next_lane = 0
+        self.session_token: Optional[bytes] = None
+        self.detached = False
+        self.resumption: Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter, Dict[int, Tuple[ResumeFlag, int, int]]]] = None
+        self.resume_requested = asyncio.Event()
+        self.lingering: OrderedDict[int, Tuple[float, ReplayBuffer]] = OrderedDict()
+        self.remote_ports: List[int] = []
+        self.listeners: List[socket.socket] = []
+        self.stopped = asyncio.Event()
         self.login: Optional[str] = None
+        self.version = 0
+        self.capabilities = Capability.NONE
+        self.max_frame_size = config["limits"]["max_data_size"]
+        self.max_chunk_size = self.max_frame_size
         self.running = True
         self.tasks: List[asyncio.Task] = []
-        self.logger = logging.getLogger(__name__)
+        self.session_id = secrets.token_hex(8)
+        self.logger = SessionLoggerAdapter(logging.getLogger(__name__), self)
+
+    @property
+    def window_size(self) -> int:
+        return self.config["limits"]["window_size"] if self.capabilities & Capability.WINDOWING else UNLIMITED_WINDOW
+
+    @property
+    def resumable(self) -> bool:
+        return self.running and self.session_token is not None and bool(self.capabilities & Capability.RESUMPTION)
 
-    def allocate_port(self) -> int:
-        allowed_range = self.config["allowed_port_range"]
-        for _ in range(100):
-            port = random.randint(allowed_range[0], allowed_range[1])
-            if port not in self.used_ports:
-                self.used_ports.add(port)
-                return port
+    def reservation_key(self, binding: int) -> Optional[str]:
+        return self.login if binding == 0 or self.login is None else f"{self.login}#{binding}"
 
-        raise RuntimeError("Failed to allocate port after maximum attempts")
+    async def allocate_port(self, binding: int = 0) -> Tuple[int, socket.socket]:
+        for _ in range(self.config["ports"]["bind_attempts"]):
+            port = await self.port_pool.allocate(self.reservation_key(binding))
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            try:
+                listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                listener.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                listener.setblocking(False)
+                listener.bind((self.config["host"], port))
+                listener.listen(self.config["limits"]["backlog"])
+            except OSError as error:
+                listener.close()
+                self.logger.warning(f"Port {port} is not bindable for {self.login}: {error}")
+                await self.port_pool.release(port, failed=True)
+                continue
+
+            return port, listener
+
+        raise RuntimeError(f"No bindable port after {self.config["ports"]["bind_attempts"]} attempts")
+
+    async def reject(self, reason: str) -> None:
+        try:
+            await self.send_frame(PackageType.CLOSE, 0, reason.encode())
+        except (ConnectionResetError, OSError) as error:
+            self.logger.debug(f"Failed to send rejection: {error}")
 
     async def close_writer(self) -> None:
+        if self.frames:
+            await self.frames.close()
+            self.frames = None
+
         if self.writer and not self.writer.is_closing():
             try:
                 self.writer.close()
@@ -46,23 +107,76 @@ class TunnelClientHandler:
 
         self.writer = None
 
-    async def close_connection(self, connection_id: int) -> None:
-        async with self.lock:
-            writer = self.connection_map.pop(connection_id, None)
-            if writer:
-                try:
-                    if not writer.is_closing():
-                        writer.close()
-                        await writer.wait_closed()
-                except (ConnectionResetError, OSError):
-                    pass
+    def send_package(self, package_type: int, connection_id: int, payload: bytes = b"", lane: Optional[FrameWriter] = None) -> bool:
+        frames = lane or self.frames
+        if not self.running or frames is None:
+            return False
+
+        return frames.send(package_type, connection_id, payload)
+
+    def pick_lane(self) -> Optional[FrameWriter]:
+        lanes = [lane for lane in self.lanes if not lane.closed]
+        if not lanes:
+            return self.frames
+
+        self.next_lane += 1
+        return lanes[self.next_lane % len(lanes)]
+
+    def create_frame_writer(self, writer: asyncio.StreamWriter) -> FrameWriter:
+        return FrameWriter(writer, self.max_frame_size, self.config["timeouts"]["write"], self.config["limits"]["queue_size"], DEFAULT_BATCH_SIZE if self.capabilities & Capability.BATCHING else 1, self.stats)
+
+    def create_compressor(self) -> StreamCompressor:
+        compression = self.config["compression"]
+        return StreamCompressor(compression["level"], compression["min_size"], compression["offload_threshold"])
+
+    def linger(self, connection_id: int, replay: ReplayBuffer) -> None:
+        now = time.monotonic()
+        while self.lingering and next(iter(self.lingering.values()))[0] < now - self.config["sessions"]["grace_period"]:
+            self.lingering.popitem(last=False)
+
+        self.lingering[connection_id] = (now, replay)
+
+    async def close_connection(self, connection_id: int, notify: bool = False) -> None:
+        stream = self.connection_map.pop(connection_id, None)
+        if stream:
+            if stream.idle_timer:
+                stream.idle_timer.cancel()
+            if notify:
+                self.send_package(PackageType.CLOSE, connection_id, lane=stream.lane)
+                if stream.replay is not None and stream.replay.pending and self.resumable:
+                    self.linger(connection_id, stream.replay)
+
+            await stream.close()
+            self.logger.info("Connection %s|%s closed.", self.login, connection_id, extra={"sampled": True, "connection_id": connection_id, "remote_port": stream.remote_port, "bytes_in": stream.send_window.consumed_total, "bytes_out": stream.receive_window.received_total, "duration": round(time.monotonic() - stream.opened, 3)})
+
+    def decompress(self, stream: Union[TunnelStream, VisitorProtocol], payload: bytes) -> bytes:
+        if not self.capabilities & Capability.COMPRESSION:
+            raise ProtocolError("Compressed data received without negotiated compression")
+        if stream.decompressor is None:
+            stream.decompressor = StreamDecompressor()
+
+        return stream.decompressor.decompress(payload, self.max_frame_size)
+
+    def expire(self) -> None:
+        self.logger.info(f"Client {self.login} idle for {self.config["timeouts"]["idle"]} seconds, closing.")
+        self.capabilities &= ~Capability.RESUMPTION
+        if self.writer and not self.writer.is_closing():
+            self.writer.close()
 
-                self.logger.info(f"Connection {self.login}|{connection_id} closed.", extra={"client_ip": self.client_ip})
+    def expire_connection(self, connection_id: int) -> None:
+        if connection_id in self.connection_map:
+            self.logger.info("Connection %s|%s idle for %s seconds, closing.", self.login, connection_id, self.config["timeouts"]["connection"], extra={"sampled": True, "connection_id": connection_id})
+            asyncio.ensure_future(self.close_connection(connection_id, notify=True))
 
     async def cleanup(self) -> None:
-        self.logger.debug(f"Starting cleanup for {self.client_ip}, tasks: {len(self.tasks)}, connections: {len(self.connection_map)}.", extra={"client_ip": self.client_ip})
+        self.logger.debug(f"Starting cleanup for {self.client_ip}, tasks: {len(self.tasks)}, connections: {len(self.connection_map)}.")
 
         self.running = False
+        self.stopped.set()
+        self.metrics.unregister(self)
+        if self.idle_timer:
+            self.idle_timer.cancel()
+
         for task in self.tasks:
             if not task.done():
                 task.cancel()
@@ -74,103 +188,338 @@ class TunnelClientHandler:
                 pass
         self.tasks.clear()
 
-        async with self.lock:
-            for connection_id in list(self.connection_map):
-                await self.close_connection(connection_id)
-            self.connection_map.clear()
+        for connection_id in list(self.connection_map):
+            await self.close_connection(connection_id)
 
-        if self.remote_port:
-            async with self.clients_lock:
-                self.used_ports.discard(self.remote_port)
-            self.remote_port = None
+        for listener in self.listeners:
+            listener.close()
+        self.listeners = []
+        if self.resumption:
+            self.resumption[1].close()
+            self.resumption = None
 
-        async with self.clients_lock:
-            self.clients.pop(self.sock, None)
+        await self.release_ports()
+
+        if self.session_token:
+            async with self.clients_lock:
+                self.clients.pop(self.session_token, None)
 
         await self.close_writer()
-        self.logger.debug(f"Cleanup completed for client {self.login or "unknown"}.", extra={"client_ip": self.client_ip})
+        self.logger.debug(f"Cleanup completed for client {self.login or "unknown"}.")
 
-    async def authenticate(self) -> bool:
-        try:
-            auth_data = (await asyncio.wait_for(self.reader.read(self.config["limits"]["max_auth_size"]), timeout=self.config["timeouts"]["auth"])).decode().strip()
+    async def send_frame(self, package_type: PackageType, connection_id: int, payload: bytes = b"") -> None:
+        self.writer.write(pack_package(package_type, connection_id, payload, max_payload_size=self.config["limits"]["max_data_size"]))
+        await self.writer.drain()
 
-            if len(auth_data) > self.config["limits"]["max_auth_size"]:
-                self.logger.warning("Auth data exceeds maximum size.", extra={"client_ip": self.client_ip})
-                return False
+    async def release_ports(self) -> None:
+        for binding, port in enumerate(self.remote_ports):
+            try:
+                await self.port_pool.release(port, self.reservation_key(binding))
+            except RuntimeError as error:
+                self.logger.warning(f"Failed to release port {port}: {error}")
+        self.remote_ports = []
+
+    async def open_tunnel(self, bindings: int = 1) -> Optional[str]:
+        max_bindings = self.config["limits"]["max_bindings"]
+        if bindings > max_bindings:
+            self.logger.warning(f"{self.login} requested {bindings} bindings, maximum is {max_bindings}.")
+            return f"Too many bindings: {bindings}, maximum {max_bindings}"
 
+        try:
+            for binding in range(bindings):
+                port, listener = await self.allocate_port(binding)
+                self.remote_ports.append(port)
+                self.listeners.append(listener)
+        except RuntimeError as error:
+            self.logger.error(f"Failed to allocate port: {error}")
+            for listener in self.listeners:
+                listener.close()
+            self.listeners = []
+            await self.release_ports()
+            return f"Failed to allocate port: {error}"
+
+        return None
+
+    def new_connection_payload(self, binding: int) -> bytes:
+        return pack_new_connection(self.remote_ports[binding], binding if self.capabilities & Capability.BINDINGS else None)
+
+    async def verify(self, login: str, password: str) -> bool:
+        started = time.perf_counter()
+        valid = await self.config["account_index"].verify(login, password)
+        self.metrics.observe_auth(time.perf_counter() - started, valid)
+        return valid
+
+    async def authenticate(self) -> bool:
+        try:
             if self.writer is None or self.writer.is_closing():
-                self.logger.warning("Writer is closed or None before authentication.", extra={"client_ip": self.client_ip})
+                self.logger.warning("Writer is closed or None before authentication.")
                 return False
 
-            if auth_data.startswith("__test__:"):
-                parts = auth_data.split(":", 2)
-                if len(parts) != 3:
-                    return False
+            first_byte = await asyncio.wait_for(self.reader.readexactly(1), timeout=self.config["timeouts"]["auth"])
+            if first_byte[0] == PackageType.HELLO:
+                return await asyncio.wait_for(self.handshake(first_byte), timeout=self.config["timeouts"]["auth"])
 
-                login, password = parts[1], parts[2]
-                self.login = login
+            return await self.legacy_authenticate(first_byte)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, UnicodeDecodeError, ConnectionResetError, OSError) as error:
+            self.logger.warning(f"Authentication failed: {error}")
+            return False
+        except ProtocolError as error:
+            self.logger.warning(f"Invalid handshake: {error}")
+            return False
+        except Exception as error:
+            self.logger.error(f"Unexpected error during authentication: {error}", exc_info=True)
+            return False
 
-                if not isinstance(self.config["accounts"], list):
-                    self.logger.error("Invalid accounts configuration: expected list.", extra={"client_ip": self.client_ip})
-                    return False
+    async def handshake(self, first_byte: bytes) -> bool:
+        max_auth_size = self.config["limits"]["max_auth_size"]
+
+        package_type, _, payload = await unpack_package(self.reader, max_payload_size=max_auth_size, prefix=first_byte)
+        version, capabilities, max_frame_size = unpack_hello(payload)
+        if max_frame_size <= 0:
+            raise ProtocolError(f"Invalid max frame size: {max_frame_size}")
+
+        self.version = min(version, PROTOCOL_VERSION)
+        self.capabilities = capabilities & (SERVER_CAPABILITIES | (Capability.COMPRESSION if self.config["compression"]["enabled"] else Capability.NONE))
+        if not self.config["sessions"]["resumable"] or not self.capabilities & Capability.WINDOWING:
+            self.capabilities &= ~Capability.RESUMPTION
+        self.max_frame_size = min(max_frame_size, self.config["limits"]["max_data_size"])
+        if self.capabilities & Capability.COMPRESSION:
+            if self.max_frame_size <= 2 * COMPRESSION_HEADROOM:
+                self.capabilities &= ~Capability.COMPRESSION
+            else:
+                self.max_chunk_size = self.max_frame_size - COMPRESSION_HEADROOM
+        else:
+            self.max_chunk_size = self.max_frame_size
+        await self.send_frame(PackageType.HELLO, 0, pack_hello(self.version, self.capabilities, self.max_frame_size))
+
+        package_type, _, payload = await unpack_package(self.reader, max_payload_size=max(max_auth_size, self.max_frame_size))
+        if package_type == PackageType.JOIN:
+            return await self.join(payload)
+        if package_type == PackageType.RESUME:
+            return await self.resume_session(payload)
+        if package_type != PackageType.AUTH:
+            raise ProtocolError(f"Expected AUTH package, received {package_type}")
+
+        login, password, flags, bindings = unpack_auth(payload)
+        if not await self.verify(login, password):
+            self.logger.warning(f"Invalid credentials for login: {login}.")
+            await self.send_frame(PackageType.AUTH_RESULT, 0, pack_auth_result(AuthStatus.INVALID_CREDENTIALS, "Invalid credentials"))
+            return False
 
-                if any(account.get("login") == login and account.get("password") == password for account in self.config["accounts"]):
-                    self.logger.debug(f"Test credentials successful for {login}.", extra={"client_ip": self.client_ip})
-                    try:
-                        self.writer.write(b"OK")
-                        await self.writer.drain()
-                    except (ConnectionResetError, OSError) as error:
-                        self.logger.warning(f"Failed to send response for test auth: {error}", extra={"client_ip": self.client_ip})
-                    finally:
-                        await self.close_writer()
+        self.login = login
+        if flags & AuthFlag.TEST:
+            self.logger.debug(f"Test credentials successful for {login}.")
+            await self.send_frame(PackageType.AUTH_RESULT, 0, pack_auth_result(AuthStatus.OK))
+            return False
 
-                    return False
+        error = await self.open_tunnel(bindings if self.capabilities & Capability.BINDINGS else 1)
+        if error:
+            await self.send_frame(PackageType.AUTH_RESULT, 0, pack_auth_result(AuthStatus.UNAVAILABLE, error))
+            return False
 
-                return False
+        await self.send_frame(PackageType.AUTH_RESULT, 0, pack_auth_result(AuthStatus.OK))
+        for binding in range(len(self.remote_ports)):
+            await self.send_frame(PackageType.NEW_CONNECTION, 0, self.new_connection_payload(binding))
+
+        self.logger.info(f"Authentication successful for {self.login} (protocol {self.version}, capabilities {self.capabilities!r}, max frame {self.max_frame_size}).")
+        return True
 
-            if ":" not in auth_data:
-                self.logger.warning("Invalid authentication format: missing colon.", extra={"client_ip": self.client_ip})
+    async def join(self, payload: bytes) -> bool:
+        token = unpack_join(payload)
+        async with self.clients_lock:
+            session: Optional[TunnelClientHandler] = self.clients.get(token)
+
+        if session is None or not session.running or session.detached:
+            self.logger.warning("Lane join for unknown session.")
+            await self.send_frame(PackageType.AUTH_RESULT, 0, pack_auth_result(AuthStatus.UNAVAILABLE, "Unknown session"))
+            return False
+
+        max_lanes = self.config["limits"]["max_lanes"]
+        if len(session.lanes) >= max_lanes:
+            self.logger.warning(f"Lane join for {session.login} rejected, session already has {max_lanes} lanes.")
+            await self.send_frame(PackageType.AUTH_RESULT, 0, pack_auth_result(AuthStatus.UNAVAILABLE, f"Too many lanes: maximum {max_lanes}"))
+            return False
+
+        await self.send_frame(PackageType.AUTH_RESULT, 0, pack_auth_result(AuthStatus.OK))
+        lane = session.add_lane(self.reader, self.writer)
+        self.logger.info(f"Lane {lane} joined session of {session.login}.")
+
+        self.reader = None
+        self.writer = None
+        return False
+
+    async def open_session(self) -> None:
+        self.session_token = secrets.token_bytes(SESSION_TOKEN_SIZE)
+        async with self.clients_lock:
+            self.clients[self.session_token] = self
+
+        self.send_package(PackageType.SESSION, 0, pack_session(self.config["limits"]["max_lanes"], self.session_token))
+
+    async def resume_session(self, payload: bytes) -> bool:
+        token, entries = unpack_resume(payload)
+        async with self.clients_lock:
+            session: Optional[TunnelClientHandler] = self.clients.get(token)
+
+        if session is None or not session.resumable:
+            self.logger.warning("Resume request for unknown session.")
+            await self.send_frame(PackageType.AUTH_RESULT, 0, pack_auth_result(AuthStatus.UNAVAILABLE, "Unknown session"))
+            return False
+
+        await self.send_frame(PackageType.AUTH_RESULT, 0, pack_auth_result(AuthStatus.OK))
+        session.request_resume(self.reader, self.writer, entries)
+        self.logger.info(f"Client {session.login} is resuming its session.")
+
+        self.reader = None
+        self.writer = None
+        return False
+
+    def request_resume(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, entries: Dict[int, Tuple[ResumeFlag, int, int]]) -> None:
+        if self.resumption:
+            self.resumption[1].close()
+
+        self.resumption = (reader, writer, entries)
+        self.resume_requested.set()
+        if not self.detached and self.writer and not self.writer.is_closing():
+            self.writer.close()
+
+    async def wait_for_resume(self) -> bool:
+        if not self.resumable:
+            return False
+
+        await self.detach()
+        if self.resumption is None:
+            grace_period = self.config["sessions"]["grace_period"]
+            self.logger.info(f"Client {self.login} disconnected, keeping session for {grace_period} seconds.")
+            try:
+                await asyncio.wait_for(self.resume_requested.wait(), timeout=grace_period)
+            except asyncio.TimeoutError:
+                self.logger.info(f"Session of {self.login} expired.")
                 return False
 
-            login, password = auth_data.split(":", 1)
+        reader, writer, entries = self.resumption
+        self.resumption = None
+        self.resume_requested.clear()
+        sent = self.attach(reader, writer)
+
+        try:
+            resume_streams(self.connection_map, self.lingering, entries, sent, self.frames, self.max_chunk_size, self.create_compressor)
+        except ProtocolError as error:
+            self.logger.warning(f"Failed to resume session of {self.login}: {error}")
+            return False
+
+        self.logger.info(f"Session of {self.login} resumed with {len(self.connection_map)} connections.")
+        return True
+
+    async def detach(self) -> None:
+        self.detached = True
+        lanes, self.lanes = self.lanes, []
+        for lane in lanes:
+            if not lane.writer.is_closing():
+                lane.writer.close()
+            await lane.close()
+
+        self.frames = None
+        self.reader = None
+        self.writer = None
+
+    def attach(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Dict[int, Tuple[int, int, int]]:
+        sent = resume_entries(self.connection_map, self.lingering, self.max_frame_size)
+        writer.write(pack_package(PackageType.RESUME, 0, pack_resume(self.session_token, sent), max_payload_size=self.max_frame_size))
+
+        self.reader = reader
+        self.writer = writer
+        self.frames = self.create_frame_writer(writer)
+        self.lanes = [self.frames]
+        self.tasks.append(self.frames.start())
+        self.detached = False
+        return sent
+
+    def add_lane(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> int:
+        frames = self.create_frame_writer(writer)
+        self.lanes.append(frames)
+        self.tasks.append(frames.start())
+        self.tasks.append(asyncio.create_task(self.serve_lane(reader, writer, frames)))
+        return len(self.lanes) - 1
+
+    async def serve_lane(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, frames: FrameWriter) -> None:
+        try:
+            while self.running:
+                try:
+                    package_type, connection_id, payload = await unpack_package(reader, max_payload_size=self.max_frame_size)
+                except ProtocolError as error:
+                    if isinstance(error.__cause__, asyncio.IncompleteReadError):
+                        break
+
+                    self.logger.debug(f"Protocol error on lane of {self.login}: {error}")
+                    continue
 
-            if not isinstance(self.config["accounts"], list):
-                self.logger.error("Invalid accounts configuration: expected list.", extra={"client_ip": self.client_ip})
+                if not self.running or not await self.dispatch(package_type, connection_id, payload, frames):
+                    break
+        except (ConnectionResetError, ConnectionAbortedError, OSError) as error:
+            self.logger.info(f"Lane of {self.login} disconnected: {error}")
+        finally:
+            await frames.close()
+            if not writer.is_closing():
+                writer.close()
+
+            if frames in self.lanes:
+                self.lanes.remove(frames)
+                if self.resumable:
+                    if self.writer and not self.writer.is_closing():
+                        self.writer.close()
+                else:
+                    for connection_id, stream in list(self.connection_map.items()):
+                        if stream.lane is frames:
+                            await self.close_connection(connection_id)
+
+    async def legacy_authenticate(self, first_byte: bytes) -> bool:
+        auth_data = (first_byte + await asyncio.wait_for(self.reader.read(self.config["limits"]["max_auth_size"] - 1), timeout=self.config["timeouts"]["auth"])).decode().strip()
+
+        if auth_data.startswith("__test__:"):
+            parts = auth_data.split(":", 2)
+            if len(parts) != 3:
                 return False
 
-            for account in self.config["accounts"]:
-                if not isinstance(account, dict):
-                    self.logger.error(f"Invalid account entry: {account}.", extra={"client_ip": self.client_ip})
-                    return False
+            login, password = parts[1], parts[2]
+            self.login = login
 
-                if account.get("login") == login and account.get("password") == password:
-                    self.login = login
-                    try:
-                        self.remote_port = self.allocate_port()
-                    except RuntimeError as error:
-                        self.logger.error(f"Failed to allocate port: {error}", extra={"client_ip": self.client_ip})
-                        return False
+            if await self.verify(login, password):
+                self.logger.debug(f"Test credentials successful for {login}.")
+                try:
+                    self.writer.write(b"OK")
+                    await self.writer.drain()
+                except (ConnectionResetError, OSError) as error:
+                    self.logger.warning(f"Failed to send response for test auth: {error}")
+                finally:
+                    await self.close_writer()
 
-                    try:
-                        self.writer.write(pack_package(PackageType.NEW_CONNECTION, 0, self.remote_port.to_bytes(4, "big"), max_payload_size=self.config["limits"]["max_data_size"]))
-                        await self.writer.drain()
-                    except (ConnectionResetError, OSError) as error:
-                        self.logger.warning(f"Failed to send NEW_CONNECTION test package: {error}", extra={"client_ip": self.client_ip})
-                        return False
+            return False
+
+        if ":" not in auth_data:
+            self.logger.warning("Invalid authentication format: missing colon.")
+            return False
 
-                    self.logger.info(f"Authentication successful for {self.login}.", extra={"client_ip": self.client_ip})
-                    return True
+        login, password = auth_data.split(":", 1)
 
-            self.logger.warning(f"Invalid credentials for login: {login}.", extra={"client_ip": self.client_ip})
+        if not await self.verify(login, password):
+            self.logger.warning(f"Invalid credentials for login: {login}.")
             return False
 
-        except (asyncio.TimeoutError, UnicodeDecodeError, ConnectionResetError, OSError) as error:
-            self.logger.warning(f"Authentication failed: {error}", extra={"client_ip": self.client_ip})
+        self.login = login
+        error = await self.open_tunnel()
+        if error:
+            await self.reject(error)
             return False
-        except Exception as error:
-            self.logger.error(f"Unexpected error during authentication: {error}", exc_info=True, extra={"client_ip": self.client_ip})
+
+        try:
+            await self.send_frame(PackageType.NEW_CONNECTION, 0, self.new_connection_payload(0))
+        except (ConnectionResetError, OSError) as error:
+            self.logger.warning(f"Failed to send NEW_CONNECTION test package: {error}")
             return False
 
+        self.logger.info(f"Authentication successful for {self.login} (legacy protocol).")
+        return True
+
     async def listen_loop(self) -> None:
         try:
             if not await self.authenticate():
@@ -178,180 +527,213 @@ class TunnelClientHandler:
                 return
 
             if self.writer is None or self.writer.is_closing():
-                self.logger.warning("Writer closed after authentication, stopping listen_loop.", extra={"client_ip": self.client_ip})
+                self.logger.warning("Writer closed after authentication, stopping listen_loop.")
                 await self.cleanup()
                 return
 
-            self.tasks.append(asyncio.create_task(self.handle_listener()))
-            while self.running:
-                try:
-                    package_type, connection_id, payload = await asyncio.wait_for(unpack_package(self.reader, max_payload_size=self.config["limits"]["max_data_size"]), timeout=self.config["timeouts"]["read"])
-                    if not self.running:
-                        break
+            self.metrics.register(self)
+            self.frames = self.create_frame_writer(self.writer)
+            self.lanes = [self.frames]
+            self.tasks.append(self.frames.start())
+            for binding, listener in enumerate(self.listeners):
+                self.tasks.append(asyncio.create_task(self.handle_listener(binding, listener)))
+            self.listeners = []
+            self.idle_timer = self.timeouts.register(lambda: self.config["timeouts"]["idle"], self.expire)
+            if self.capabilities & (Capability.STRIPING | Capability.RESUMPTION):
+                await self.open_session()
+
+            while True:
+                while self.running:
+                    try:
+                        package_type, connection_id, payload = await unpack_package(self.reader, max_payload_size=self.max_frame_size)
+                        if not self.running:
+                            break
 
-                    if package_type == PackageType.PING:
-                        async with self.lock:
-                            if self.writer is None or self.writer.is_closing():
-                                self.logger.warning("Writer closed during PING processing.", extra={"client_ip": self.client_ip})
-                                break
-
-                            self.writer.write(pack_package(PackageType.PONG, connection_id, payload, max_payload_size=self.config["limits"]["max_data_size"]))
-                            await asyncio.wait_for(self.writer.drain(), timeout=self.config["timeouts"]["write"])
-                    elif package_type == PackageType.DATA:
-                        async with self.lock:
-                            if connection_id in self.connection_map:
-                                try:
-                                    self.connection_map[connection_id].write(payload)
-                                    await self.connection_map[connection_id].drain()
-                                except (ConnectionResetError, OSError):
-                                    await self.close_connection(connection_id)
-                    elif package_type == PackageType.CLOSE:
-                        await self.close_connection(connection_id)
-                    else:
-                        self.logger.warning(f"Unexpected package type: {package_type}.", extra={"client_ip": self.client_ip})
-                except asyncio.TimeoutError:
-                    self.logger.debug("Read timeout in listen_loop.", extra={"client_ip": self.client_ip})
-                    continue
-                except ProtocolError as error:
-                    if isinstance(error.__cause__, asyncio.IncompleteReadError):
-                        self.logger.info(f"Client {self.login} disconnected.", extra={"client_ip": self.client_ip})
+                        if not await self.dispatch(package_type, connection_id, payload, self.frames):
+                            break
+                    except ProtocolError as error:
+                        if isinstance(error.__cause__, asyncio.IncompleteReadError):
+                            self.logger.info(f"Client {self.login} disconnected.")
+                            break
+
+                        self.logger.debug(f"Protocol error in listen_loop: {error}")
+                        continue
+                    except (ConnectionResetError, ConnectionAbortedError, OSError) as error:
+                        self.logger.info(f"Client {self.login} disconnected.")
+                        break
+                    except Exception as error:
+                        self.logger.error(f"Unexpected error in listen_loop: {error}", exc_info=True)
                         break
 
-                    self.logger.debug(f"Protocol error in listen_loop: {error}", extra={"client_ip": self.client_ip})
-                    continue
-                except (ConnectionResetError, ConnectionAbortedError, OSError) as error:
-                    self.logger.info(f"Client {self.login} disconnected.", extra={"client_ip": self.client_ip})
-                    break
-                except Exception as error:
-                    self.logger.error(f"Unexpected error in listen_loop: {error}", exc_info=True, extra={"client_ip": self.client_ip})
+                if not await self.wait_for_resume():
                     break
         except Exception as error:
-            self.logger.error(f"Critical error in listen_loop: {error}", exc_info=True, extra={"client_ip": self.client_ip})
+            self.logger.error(f"Critical error in listen_loop: {error}", exc_info=True)
         finally:
             await self.cleanup()
 
-    async def handle_listener(self) -> None:
-        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        listener.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
-        listener.settimeout(1.0)
+    async def dispatch(self, package_type: int, connection_id: int, payload: bytes, lane: FrameWriter) -> bool:
+        self.idle_timer.touch()
+        self.stats.frames_received[package_type] += 1
+        self.stats.bytes_received += HEADER_SIZE + len(payload)
 
-        try:
-            listener.bind((self.config["host"], self.remote_port))
-            listener.listen()
-            self.logger.info(f"Listening on {self.config["host"]}:{self.remote_port} for {self.login}.", extra={"client_ip": self.client_ip})
+        if package_type == PackageType.PING:
+            if not self.send_package(PackageType.PONG, connection_id, payload, lane):
+                self.logger.warning("Writer closed during PING processing.")
+                return False
+        elif package_type == PackageType.DATA or package_type == PackageType.COMPRESSED_DATA:
+            stream = self.connection_map.get(connection_id)
+            if stream:
+                try:
+                    if package_type == PackageType.COMPRESSED_DATA:
+                        payload = self.decompress(stream, payload)
+                    stream.feed(payload)
+                except ProtocolError as error:
+                    self.logger.warning("Protocol violation on %s|%s: %s", self.login, connection_id, error, extra={"connection_id": connection_id})
+                    await self.close_connection(connection_id, notify=True)
+        elif package_type == PackageType.WINDOW_UPDATE:
+            increment = unpack_window_update(payload)
+            stream = self.connection_map.get(connection_id)
+            if stream:
+                if stream.replay is not None:
+                    stream.replay.acknowledge(increment)
+                stream.send_window.grant(increment)
+            elif connection_id in self.lingering:
+                replay = self.lingering[connection_id][1]
+                replay.acknowledge(increment)
+                if not replay.pending:
+                    del self.lingering[connection_id]
+        elif package_type == PackageType.CLOSE:
+            stream = self.connection_map.get(connection_id)
+            if stream:
+                stream.finish()
+        elif package_type == PackageType.DISCONNECT:
+            self.logger.info(f"Client {self.login} ended its session.")
+            self.capabilities &= ~Capability.RESUMPTION
+            return False
+        else:
+            self.logger.warning(f"Unexpected package type: {package_type}.")
 
-            async with await asyncio.start_server(self.handle_connection, sock=listener) as server:
-                while self.running:
-                    await asyncio.sleep(1)
+        return True
+
+    async def handle_listener(self, binding: int, listener: socket.socket) -> None:
+        backlog = self.config["limits"]["backlog"]
+        address = f"{self.config["host"]}:{self.remote_ports[binding]}"
+
+        try:
+            if self.config["engine"] == "protocol":
+                server = await asyncio.get_running_loop().create_server(lambda: VisitorProtocol(self, binding), sock=listener, backlog=backlog)
+            else:
+                server = await asyncio.start_server(lambda reader, writer: self.handle_connection(reader, writer, binding), sock=listener, backlog=backlog)
+            self.logger.info(f"Listening on {address} for {self.login} (binding {binding}).")
+
+            async with server:
+                await self.stopped.wait()
         except Exception as error:
-            self.logger.error(f"Failed to start listener on {self.config["host"]}:{self.remote_port}: {error}", extra={"client_ip": self.client_ip})
+            self.logger.error(f"Failed to start listener on {address}: {error}")
         finally:
             listener.close()
 
-    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    def open_connection(self, stream: Union[TunnelStream, VisitorProtocol], peername: Tuple, binding: int = 0) -> bool:
         connection_id = random.randint(1, 2 ** 31 - 1)
+        while connection_id in self.connection_map:
+            connection_id = random.randint(1, 2 ** 31 - 1)
 
-        async with self.lock:
-            if connection_id in self.connection_map:
-                connection_id = random.randint(1, 2 ** 31 - 1)
-
-            self.connection_map[connection_id] = writer
+        stream.connection_id = connection_id
+        stream.remote_port = self.remote_ports[binding]
+        self.logger.info("New incoming connection from %s:%s (%s|%s).", peername[0], peername[1], self.login, connection_id, extra={"sampled": True, "connection_id": connection_id, "remote_port": stream.remote_port})
 
-        peername = writer.get_extra_info("peername") or ("unknown", 0)
-        try:
-            self.logger.info(f"New incoming connection from {peername[0]}:{peername[1]} ({self.login}|{connection_id}).", extra={"client_ip": self.client_ip})
+        if not self.running or self.writer is None or self.writer.is_closing():
+            self.logger.warning("Writer closed before sending NEW_CONNECTION package for %s|%s.", self.login, connection_id, extra={"connection_id": connection_id})
+            return False
 
-            if self.writer is None or self.writer.is_closing():
-                self.logger.warning(f"Writer closed before sending NEW_CONNECTION package for {self.login}|{connection_id}.", extra={"client_ip": self.client_ip})
+        self.connection_map[connection_id] = stream
+        stream.lane = self.pick_lane()
+        if self.capabilities & Capability.COMPRESSION:
+            stream.compressor = self.create_compressor()
+        if self.capabilities & Capability.RESUMPTION:
+            stream.replay = ReplayBuffer()
+        stream.idle_timer = self.timeouts.register(lambda: self.config["timeouts"]["connection"], lambda: self.expire_connection(connection_id))
+        self.send_package(PackageType.NEW_CONNECTION, connection_id, self.new_connection_payload(binding), stream.lane)
+        if self.capabilities & Capability.WINDOWING:
+            self.send_package(PackageType.WINDOW_UPDATE, connection_id, pack_window_update(stream.receive_window.size), stream.lane)
+        else:
+            stream.send_window.grant(UNLIMITED_WINDOW)
+        return True
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, binding: int = 0) -> None:
+        stream = TunnelStream(0, reader, writer, self.window_size)
+        configure_socket(writer.get_extra_info("socket"), self.config["sockets"]["visitor"])
 
-                await self.close_connection(connection_id)
+        try:
+            if not self.open_connection(stream, writer.get_extra_info("peername") or ("unknown", 0), binding):
+                await stream.close()
                 return
 
-            self.writer.write(pack_package(PackageType.NEW_CONNECTION, connection_id, self.remote_port.to_bytes(4, "big"), max_payload_size=self.config["limits"]["max_data_size"]))
-            await asyncio.wait_for(self.writer.drain(), timeout=self.config["timeouts"]["write"])
-
-            self.tasks.append(asyncio.create_task(self.forward_data(reader, connection_id)))
+            self.tasks.append(asyncio.create_task(self.forward_data(stream)))
+            self.tasks.append(asyncio.create_task(self.deliver_data(stream)))
         except (ConnectionResetError, OSError) as error:
-            self.logger.info(f"Connection {self.login}|{connection_id} disconnected during initialization: {error}", extra={"client_ip": self.client_ip})
-            await self.close_connection(connection_id)
+            self.logger.info("Connection %s|%s disconnected during initialization: %s", self.login, stream.connection_id, error, extra={"sampled": True, "connection_id": stream.connection_id})
+            await self.close_connection(stream.connection_id)
         except Exception as error:
-            self.logger.error(f"Connection initialization error {self.login}|{connection_id}: {error}", exc_info=True, extra={"client_ip": self.client_ip})
-            await self.close_connection(connection_id)
-
-    async def forward_data(self, reader: asyncio.StreamReader, connection_id: int) -> None:
-        queue = asyncio.Queue(maxsize=self.config["limits"]["queue_size"])
-        send_task = None
-
-        async def send_loop():
-            while self.running:
-                try:
-                    data = await asyncio.wait_for(queue.get(), timeout=5.0)
-                    if data is None or not self.running:
-                        break
+            self.logger.error("Connection initialization error %s|%s: %s", self.login, stream.connection_id, error, exc_info=True, extra={"connection_id": stream.connection_id})
+            await self.close_connection(stream.connection_id)
 
-                    async with self.lock:
-                        if not self.running or self.writer is None or self.writer.is_closing():
-                            break
-
-                        try:
-                            self.writer.write(pack_package(PackageType.DATA, connection_id, data, max_payload_size=self.config["limits"]["max_data_size"]))
-
-                            await asyncio.wait_for(self.writer.drain(), timeout=self.config["timeouts"]["write"])
-                        except (asyncio.TimeoutError, ConnectionResetError, OSError) as error:
-                            self.logger.warning(f"Send failed for {self.login}|{connection_id}: {error}", extra={"client_ip": self.client_ip})
-                            break
-                except asyncio.TimeoutError:
-                    continue
-                except Exception as error:
-                    self.logger.error(f"Data send error for {self.login}|{connection_id}: {error}", exc_info=True, extra={"client_ip": self.client_ip})
-                    break
+    async def forward_data(self, stream: TunnelStream) -> None:
+        connection_id = stream.connection_id
 
         try:
-            send_task = asyncio.create_task(send_loop())
-            self.tasks.append(send_task)
-
             while self.running:
                 try:
-                    data = await asyncio.wait_for(reader.read(self.config["limits"]["max_data_size"]), timeout=self.config["timeouts"]["read"])
-                    if not data:
+                    credit = await stream.send_window.wait()
+                    if not credit:
                         break
-
-                    if len(data) > self.config["limits"]["max_data_size"]:
-                        self.logger.warning(f"Data packet too large ({len(data)} bytes) from {self.login}|{connection_id}.", extra={"client_ip": self.client_ip})
+                    if (stream.lane is None or not await stream.lane.wait_writable()) and not self.resumable:
                         break
 
-                    try:
-                        await asyncio.wait_for(queue.put(data), timeout=1.0)
-                    except asyncio.TimeoutError:
-                        self.logger.warning(f"Buffer overflow, data dropped for {self.login}|{connection_id}.", extra={"client_ip": self.client_ip})
+                    data = await stream.reader.read(min(credit, self.max_chunk_size))
+                    if not data:
                         break
 
-                except asyncio.TimeoutError:
-                    continue
+                    stream.idle_timer.touch()
+                    stream.send_window.consume(len(data))
+                    if stream.replay is not None:
+                        stream.replay.append(data)
+
+                    lane = stream.lane
+                    package_type, payload = await stream.compressor.encode(data) if stream.compressor else (PackageType.DATA, data)
+                    if stream.lane is not lane:
+                        continue
+                    if not self.send_package(package_type, connection_id, payload, lane) and not self.resumable:
+                        self.logger.warning("Send failed for %s|%s: control connection closed.", self.login, connection_id, extra={"connection_id": connection_id})
+                        break
                 except (ConnectionResetError, ConnectionAbortedError, OSError) as error:
-                    self.logger.info(f"Connection {self.login}|{connection_id} reset: {error}", extra={"client_ip": self.client_ip})
+                    self.logger.info("Connection %s|%s reset: %s", self.login, connection_id, error, extra={"sampled": True, "connection_id": connection_id})
                     break
                 except Exception as error:
-                    self.logger.error(f"Unexpected error in forward_data for {self.login}|{connection_id}: {error}", extra={"client_ip": self.client_ip})
+                    self.logger.error("Unexpected error in forward_data for %s|%s: %s", self.login, connection_id, error, extra={"connection_id": connection_id})
                     break
-
         finally:
-            try:
-                await queue.put(None)
-            except asyncio.QueueFull:
-                queue.get_nowait()
-                await queue.put(None)
+            await self.close_connection(connection_id, notify=not stream.send_window.closed)
+            self.logger.debug("Forward data stopped for %s|%s.", self.login, connection_id, extra={"connection_id": connection_id})
 
-            while not queue.empty():
-                queue.get_nowait()
+    async def deliver_data(self, stream: TunnelStream) -> None:
+        connection_id = stream.connection_id
 
-            if send_task and not send_task.done():
-                try:
-                    await asyncio.wait_for(send_task, timeout=2.0)
-                except (asyncio.TimeoutError, asyncio.CancelledError):
-                    send_task.cancel()
-                    await send_task
+        try:
+            while self.running:
+                payload = await stream.inbound.get()
+                if payload is None:
+                    break
 
-            await self.close_connection(connection_id)
-            self.logger.debug(f"Forward data stopped for {self.login}|{connection_id}.", extra={"client_ip": self.client_ip})
\ No newline at end of file
+                stream.idle_timer.touch()
+                stream.writer.write(payload)
+                await stream.writer.drain()
+
+                increment = stream.receive_window.release(len(payload))
+                if increment:
+                    self.send_package(PackageType.WINDOW_UPDATE, connection_id, pack_window_update(increment), stream.lane)
+        except (ConnectionResetError, ConnectionAbortedError, OSError) as error:
+            self.logger.info("Connection %s|%s reset: %s", self.login, connection_id, error, extra={"sampled": True, "connection_id": connection_id})
+        finally:
+            await self.close_connection(connection_id, notify=not stream.send_window.closed)
@@ -1,9 +1,13 @@
 import asyncio
 import logging
-from typing import Dict
+from typing import Dict, Union
 
 from config.types import Config
+from metrics.registry import MetricsRegistry
+from ports.coordinator import RemotePortPool
+from ports.pool import PortPool
 from .handler import TunnelClientHandler
+from .timeouts import TimeoutWheel
 
 
 async def shutdown(loop: asyncio.AbstractEventLoop) -> None:
@@ -16,13 +20,19 @@ async def shutdown(loop: asyncio.AbstractEventLoop) -> None:
     await loop.shutdown_default_executor()
 
 
-async def start_server(config: Config, shutdown_event: asyncio.Event, clients_lock: asyncio.Lock, clients: Dict, used_ports: set) -> None:
+async def start_server(config: Config, shutdown_event: asyncio.Event, clients_lock: asyncio.Lock, clients: Dict, port_pool: Union[PortPool, RemotePortPool], reuse_port: bool = False, worker: int = 0) -> None:
     logger = logging.getLogger(__name__)
+    timeouts = TimeoutWheel()
+    metrics = MetricsRegistry(port_pool)
 
     try:
-        server = await asyncio.start_server(lambda r, w: TunnelClientHandler(r, w, config, clients_lock, clients, used_ports).listen_loop(), config["host"], config["port"], reuse_address=True)
+        if config["metrics"]["enabled"]:
+            await metrics.start(config["metrics"]["host"], config["metrics"]["port"] + worker)
+
+        server = await asyncio.start_server(lambda r, w: TunnelClientHandler(r, w, config, clients_lock, clients, port_pool, timeouts, metrics).listen_loop(), config["host"], config["port"], reuse_address=True, reuse_port=reuse_port or None)
         logger.info(f"Server started on {config['host']}:{config['port']}.", extra={"client_ip": "server"})
 
+        timeouts.start()
         async with server:
             try:
                 await shutdown_event.wait()
@@ -31,3 +41,6 @@ async def start_server(config: Config, shutdown_event: asyncio.Event, clients_lo
     except Exception as error:
         logger.critical(f"Server startup error: {error}", extra={"client_ip": "server"})
         raise
+    finally:
+        timeouts.stop()
+        await metrics.close()
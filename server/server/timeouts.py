@@ -0,0 +1,73 @@
+import asyncio
+import math
+from typing import Callable, List, Optional, Set
+
+
+class IdleTimer:
+    __slots__ = ("wheel", "timeout", "callback", "last_activity", "deadline", "cancelled")
+
+    def __init__(self, wheel: "TimeoutWheel", timeout: Callable[[], float], callback: Callable[[], None]):
+        self.wheel = wheel
+        self.timeout = timeout
+        self.callback = callback
+        self.last_activity = wheel.now
+        self.deadline = 0
+        self.cancelled = False
+
+    def touch(self) -> None:
+        self.last_activity = self.wheel.now
+
+    def cancel(self) -> None:
+        if not self.cancelled:
+            self.cancelled = True
+            self.wheel.slots[self.deadline % len(self.wheel.slots)].discard(self)
+
+class TimeoutWheel:
+    def __init__(self, resolution: float = 1.0, size: int = 512):
+        self.resolution = resolution
+        self.slots: List[Set[IdleTimer]] = [set() for _ in range(size)]
+        self.now = 0.0
+        self.tick = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        self.now = asyncio.get_running_loop().time()
+        self.tick = int(self.now / self.resolution)
+        self.task = asyncio.create_task(self.run())
+        return self.task
+
+    def register(self, timeout: Callable[[], float], callback: Callable[[], None]) -> IdleTimer:
+        timer = IdleTimer(self, timeout, callback)
+        self.schedule(timer)
+        return timer
+
+    def schedule(self, timer: IdleTimer) -> None:
+        timeout = timer.timeout()
+        deadline = math.ceil((timer.last_activity + timeout) / self.resolution) if timeout > 0 else self.tick + len(self.slots)
+        timer.deadline = max(deadline, self.tick + 1)
+        self.slots[timer.deadline % len(self.slots)].add(timer)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.resolution)
+            self.now = loop.time()
+
+            current = int(self.now / self.resolution)
+            while self.tick < current:
+                self.tick += 1
+                self.expire(self.slots[self.tick % len(self.slots)])
+
+    def expire(self, slot: Set[IdleTimer]) -> None:
+        for timer in [timer for timer in slot if timer.deadline <= self.tick]:
+            slot.discard(timer)
+            timeout = timer.timeout()
+            if timeout > 0 and timer.last_activity + timeout <= self.now:
+                timer.cancelled = True
+                timer.callback()
+            else:
+                self.schedule(timer)
+
+    def stop(self) -> None:
+        if self.task and not self.task.done():
+            self.task.cancel()
@@ -0,0 +1,159 @@
+import asyncio
+import time
+from collections import deque
+from functools import partial
+from typing import Deque, Optional, Union
+
+from protocol.tunnel_protocol import PackageType, FlowWindow, ReceiveWindow, ReplayBuffer, StreamCompressor, StreamDecompressor, configure_socket, pack_window_update
+
+
+class VisitorProtocol(asyncio.Protocol):
+    def __init__(self, handler, binding: int = 0):
+        self.handler = handler
+        self.binding = binding
+        self.max_data_size = handler.max_chunk_size
+        self.connection_id = 0
+        self.transport: Optional[asyncio.Transport] = None
+        self.send_window = FlowWindow()
+        self.send_window.listener = self.flush
+        self.receive_window = ReceiveWindow(handler.window_size)
+        self.backlog: Deque[memoryview] = deque()
+        self.unacknowledged = 0
+        self.writing_paused = False
+        self.waiting_writable = False
+        self.compressing = False
+        self.eof = False
+        self.idle_timer = None
+        self.lane = None
+        self.replay: Optional[ReplayBuffer] = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.decompressor: Optional[StreamDecompressor] = None
+        self.remote_port = 0
+        self.opened = time.monotonic()
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+        configure_socket(transport.get_extra_info("socket"), self.handler.config["sockets"]["visitor"])
+        transport.set_write_buffer_limits(high=0)
+        transport.pause_reading()
+
+        if not self.handler.open_connection(self, transport.get_extra_info("peername") or ("unknown", 0), self.binding):
+            self.send_window.close()
+            transport.close()
+
+    def data_received(self, data: bytes) -> None:
+        self.idle_timer.touch()
+        self.backlog.append(memoryview(data))
+        self.flush()
+
+    def eof_received(self) -> bool:
+        self.eof = True
+        return bool(self.backlog) or self.compressing
+
+    def flush(self) -> None:
+        if self.transport is None or self.transport.is_closing():
+            return
+
+        frames = self.lane
+        window = self.send_window
+
+        while self.backlog and window.credit > 0 and not window.closed and not self.compressing:
+            chunk = self.backlog[0]
+            size = min(len(chunk), window.credit, self.max_data_size)
+            piece = chunk[:size]
+            if self.replay is not None:
+                self.replay.append(piece)
+
+            compressor = self.compressor
+            if compressor is not None and len(piece) >= compressor.offload_threshold and compressor.worthwhile(piece):
+                self.compressing = True
+                asyncio.ensure_future(compressor.compress_offloaded(piece)).add_done_callback(partial(self.compressed, compressor))
+            else:
+                package_type, payload = compressor.encode_nowait(piece) if compressor and len(piece) < compressor.offload_threshold else (PackageType.DATA, piece)
+                if not self.handler.send_package(package_type, self.connection_id, payload, frames) and not self.handler.resumable:
+                    self.transport.close()
+                    return
+
+            window.consume(size)
+            if size == len(chunk):
+                self.backlog.popleft()
+            else:
+                self.backlog[0] = chunk[size:]
+
+        if self.eof and not self.backlog and not self.compressing:
+            self.transport.close()
+            return
+
+        if frames is not None and not frames.writable.is_set() and not self.waiting_writable:
+            self.waiting_writable = True
+            frames.notify_writable(self.resume_sending)
+
+        if self.backlog or window.credit <= 0 or self.waiting_writable or self.compressing:
+            if self.transport.is_reading():
+                self.transport.pause_reading()
+        elif not self.transport.is_reading() and not self.eof:
+            self.transport.resume_reading()
+
+    def compressed(self, compressor: StreamCompressor, future: asyncio.Future) -> None:
+        self.compressing = False
+        if future.cancelled() or compressor is not self.compressor or self.transport is None or self.transport.is_closing():
+            return
+
+        error = future.exception()
+        if error is not None:
+            self.handler.logger.error("Compression failed for %s|%s: %s", self.handler.login, self.connection_id, error, exc_info=error, extra={"connection_id": self.connection_id})
+            self.transport.close()
+            return
+
+        if not self.handler.send_package(PackageType.COMPRESSED_DATA, self.connection_id, future.result(), self.lane) and not self.handler.resumable:
+            self.transport.close()
+            return
+        self.flush()
+
+    def resume_sending(self) -> None:
+        self.waiting_writable = False
+        self.flush()
+
+    def feed(self, payload: Union[bytes, memoryview]) -> None:
+        self.idle_timer.touch()
+        self.receive_window.receive(len(payload))
+        self.transport.write(payload)
+        self.unacknowledged += len(payload)
+
+        if not self.writing_paused:
+            self.acknowledge()
+
+    def acknowledge(self) -> None:
+        increment = self.receive_window.release(self.unacknowledged)
+        self.unacknowledged = 0
+
+        if increment:
+            self.handler.send_package(PackageType.WINDOW_UPDATE, self.connection_id, pack_window_update(increment), self.lane)
+
+    def pause_writing(self) -> None:
+        self.writing_paused = True
+
+    def resume_writing(self) -> None:
+        self.writing_paused = False
+        self.acknowledge()
+
+    def finish(self) -> None:
+        self.send_window.close()
+        self.backlog.clear()
+        if self.transport and not self.transport.is_closing():
+            self.transport.close()
+
+    async def close(self) -> None:
+        self.finish()
+        await self.closed
+
+    def connection_lost(self, error: Optional[Exception]) -> None:
+        notify = not self.send_window.closed
+        self.send_window.close()
+        self.backlog.clear()
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+        if self.connection_id in self.handler.connection_map:
+            asyncio.ensure_future(self.handler.close_connection(self.connection_id, notify=notify))
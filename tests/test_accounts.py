@@ -0,0 +1,18 @@
+import asyncio
+
+import config.accounts as accounts
+from config.accounts import AccountIndex, hash_password
+
+
+def test_unknown_login_runs_the_key_derivation(monkeypatch):
+    index = AccountIndex([{"login": "known", "password_hash": hash_password("secret", n=2 ** 4)}])
+    verified = []
+    verify_password = accounts.verify_password
+    monkeypatch.setattr(accounts, "verify_password", lambda password, password_hash: verified.append(password_hash) or verify_password(password, password_hash))
+
+    assert not asyncio.run(index.verify("unknown", "secret"))
+    assert asyncio.run(index.verify("known", "secret"))
+
+    assert len(verified) == 2
+    assert verified[0].split("$")[:4] == verified[1].split("$")[:4]
+    assert verified[0] != verified[1]
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import threading
+
+from protocol.tunnel_protocol import PackageType, StreamCompressor, StreamDecompressor, COMPRESSION_HEADROOM
+from server.visitor import VisitorProtocol
+
+
+class Handler:
+    max_chunk_size = 65536
+    window_size = 262144
+    login = "nigarok"
+    resumable = False
+
+    def __init__(self):
+        self.logger = logging.getLogger("test.visitor")
+        self.sent = []
+
+    def send_package(self, package_type, connection_id, payload, frames=None):
+        self.sent.append((package_type, connection_id, payload))
+        return True
+
+
+class Transport:
+    def __init__(self):
+        self.closing = False
+
+    def is_closing(self):
+        return self.closing
+
+    def close(self):
+        self.closing = True
+
+
+def test_default_sized_chunk_is_offloaded():
+    compressor = StreamCompressor()
+    threads = []
+    compress = compressor.compress
+
+    def tracked(data):
+        threads.append(threading.get_ident())
+        return compress(data)
+
+    compressor.compress = tracked
+    data = b"nigarok tunnel " * ((65536 - COMPRESSION_HEADROOM) // 15)
+
+    package_type, payload = asyncio.run(compressor.encode(data))
+
+    assert package_type == PackageType.COMPRESSED_DATA
+    assert threads and threads[0] != threading.get_ident()
+    assert StreamDecompressor().decompress(payload, 65536) == data
+
+def test_small_chunk_stays_on_loop():
+    compressor = StreamCompressor()
+    threads = []
+    compress = compressor.compress
+    compressor.compress = lambda data: threads.append(threading.get_ident()) or compress(data)
+
+    package_type, _ = asyncio.run(compressor.encode(b"x" * 4096))
+
+    assert package_type == PackageType.COMPRESSED_DATA
+    assert threads == [threading.get_ident()]
+
+
+def test_failed_offloaded_compression_closes_the_visitor(caplog):
+    async def run():
+        handler = Handler()
+        visitor = VisitorProtocol(handler)
+        visitor.connection_id = 7
+        visitor.transport = Transport()
+        visitor.compressor = StreamCompressor()
+        visitor.compressing = True
+
+        future = asyncio.get_running_loop().create_future()
+        future.set_exception(MemoryError("out of memory"))
+        visitor.compressed(visitor.compressor, future)
+        return handler, visitor
+
+    handler, visitor = asyncio.run(run())
+
+    assert visitor.transport.closing
+    assert not visitor.compressing
+    assert handler.sent == []
+    assert "Compression failed for nigarok|7" in caplog.text
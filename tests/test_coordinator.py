@@ -0,0 +1,46 @@
+import asyncio
+import socket
+import tempfile
+from pathlib import Path
+
+from ports.coordinator import PortCoordinator, RemotePortPool
+from ports.pool import PortPool
+
+
+async def coordinated(logins):
+    with tempfile.TemporaryDirectory() as directory:
+        path = str(Path(directory) / "coordinator.sock")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        sock.listen()
+
+        pool = PortPool([20000, 20009])
+        coordinator = PortCoordinator(pool, sock)
+        await coordinator.start()
+        remote = RemotePortPool(path)
+        try:
+            ports = {}
+            for login in logins:
+                ports[login] = await remote.allocate(login)
+                await remote.release(ports[login], login)
+            return pool, ports
+        finally:
+            remote.writer.close()
+            await coordinator.close()
+
+
+def test_login_with_space_keeps_its_own_reservation():
+    async def scenario():
+        pool, ports = await coordinated(["John Doe"])
+        assert set(pool.allocator.reservations) == {"John Doe"}
+        assert await pool.allocate("John Smith") != ports["John Doe"]
+        assert await pool.allocate("John Doe") == ports["John Doe"]
+
+    asyncio.run(scenario())
+
+def test_dash_login_round_trips():
+    async def scenario():
+        pool, ports = await coordinated(["-"])
+        assert pool.allocator.reservations["-"][0] == ports["-"]
+
+    asyncio.run(scenario())
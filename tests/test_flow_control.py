@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from protocol.tunnel_protocol import FlowWindow, ProtocolError, ReceiveWindow, pack_window_update, unpack_window_update
+
+
+def test_receive_window_rejects_data_beyond_the_window():
+    window = ReceiveWindow(1024)
+    window.receive(1024)
+
+    with pytest.raises(ProtocolError):
+        window.receive(1)
+
+def test_receive_window_releases_credit_in_half_window_increments():
+    window = ReceiveWindow(1024)
+    window.receive(1024)
+
+    assert window.release(511) == 0
+    assert window.release(1) == 512
+    assert window.outstanding == 512
+    assert window.granted_total == 1536
+
+    window.receive(512)
+    assert window.release(512) == 512
+    assert window.release(0) == 0
+
+def test_flow_window_credit_accounting():
+    calls = []
+    window = FlowWindow(1024)
+    window.listener = lambda: calls.append(window.credit)
+
+    window.consume(1024)
+    assert window.credit == 0
+    assert not window.event.is_set()
+    assert window.consumed_total == 1024
+
+    window.grant(512)
+    assert window.credit == 512
+    assert window.event.is_set()
+    assert calls == [512]
+
+    window.reset(256)
+    assert window.credit == 256
+    assert calls == [512, 256]
+
+def test_flow_window_wait_blocks_until_granted_or_closed():
+    async def run():
+        window = FlowWindow()
+        waiter = asyncio.create_task(window.wait())
+        await asyncio.sleep(0)
+        blocked = not waiter.done()
+        window.grant(100)
+        granted = await waiter
+
+        window.consume(100)
+        waiter = asyncio.create_task(window.wait())
+        await asyncio.sleep(0)
+        window.close()
+        return blocked, granted, await waiter
+
+    assert asyncio.run(run()) == (True, 100, 0)
+
+def test_window_updates_keep_sender_within_receiver_window():
+    sender = FlowWindow(4096)
+    receiver = ReceiveWindow(4096)
+    sent = 0
+
+    while sent < 65536:
+        size = min(sender.credit, 700)
+        assert size > 0
+        sender.consume(size)
+        receiver.receive(size)
+        sent += size
+
+        increment = receiver.release(size)
+        if increment:
+            sender.grant(unpack_window_update(pack_window_update(increment)))
+
+    assert receiver.received_total == sender.consumed_total == sent
+    assert receiver.granted_total - receiver.received_total == sender.credit
+
+def test_window_update_payload_size_is_checked():
+    with pytest.raises(ProtocolError):
+        unpack_window_update(b"\x00\x00\x01")
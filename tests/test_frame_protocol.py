@@ -0,0 +1,201 @@
+import asyncio
+import os
+
+import pytest
+
+from protocol.tunnel_protocol import FrameProtocol, FrameWriter, PackageType, ProtocolError, HEADER, MAX_CONNECTION_ID, pack_package
+
+
+class Transport:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def decode(data: bytes, chunk_size: int, max_payload_size: int = 65536):
+    async def run():
+        frames = []
+        protocol = FrameProtocol(lambda package_type, connection_id, payload: frames.append((package_type, connection_id, bytes(payload))), max_payload_size)
+        protocol.connection_made(Transport())
+
+        view = memoryview(data)
+        for offset in range(0, len(data), chunk_size):
+            chunk = view[offset:offset + chunk_size]
+            position = 0
+            while position < len(chunk):
+                buffer = protocol.get_buffer(-1)
+                size = min(len(buffer), len(chunk) - position)
+                buffer[:size] = chunk[position:position + size]
+                protocol.buffer_updated(size)
+                position += size
+        return frames, protocol
+
+    return asyncio.run(run())
+
+
+FRAMES = [(PackageType.DATA, connection_id, os.urandom(size)) for connection_id, size in enumerate([0, 1, 7, 9, 1000, 65536, 30000, 65536, 3], 1)]
+STREAM = b"".join(pack_package(*frame) for frame in FRAMES)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 9, 4096, 65545, len(STREAM)])
+def test_split_and_coalesced_buffers_decode_the_same_frames(chunk_size):
+    frames, protocol = decode(STREAM, chunk_size)
+    assert frames == FRAMES
+    assert protocol.start == protocol.end == 0
+
+def test_partial_frame_waits_for_the_rest():
+    frames, protocol = decode(STREAM[:-2], len(STREAM))
+    assert frames == FRAMES[:-1]
+    assert protocol.end - protocol.start == len(pack_package(*FRAMES[-1])) - 2
+
+@pytest.mark.parametrize("header", [HEADER.pack(250, 1, 0), HEADER.pack(PackageType.DATA, 2 ** 31, 0), HEADER.pack(PackageType.DATA, 1, 1025)])
+def test_invalid_header_closes_the_transport(header):
+    frames, protocol = decode(pack_package(PackageType.PING, 0, b"ok") + header + bytes(1025), 4096, max_payload_size=1024)
+    assert frames == [(PackageType.PING, 0, b"ok")]
+    assert protocol.transport.closed
+    assert isinstance(protocol.error, ProtocolError)
+
+
+@pytest.mark.parametrize("package_type, connection_id", [(PackageType.DATA, MAX_CONNECTION_ID + 1), (PackageType.DATA, -1), (0xEE, 1)])
+def test_pack_package_rejects_invalid_headers(package_type, connection_id):
+    with pytest.raises(ProtocolError):
+        pack_package(package_type, connection_id, b"data")
+
+
+def test_frame_writer_header_enforces_max_payload_size():
+    frames = FrameWriter(None, max_payload_size=1024)
+
+    assert frames.header(PackageType.DATA, 7, 1024) == HEADER.pack(PackageType.DATA, 7, 1024)
+    with pytest.raises(ProtocolError):
+        frames.header(PackageType.DATA, 7, 1025)
+    with pytest.raises(ProtocolError):
+        frames.send(PackageType.DATA, 7, bytes(1025))
+
+
+class Writer:
+    def __init__(self, buffered: int = 0):
+        self.transport = self
+        self.buffered = buffered
+        self.written = []
+        self.drained = asyncio.Event()
+        self.closing = False
+
+    def is_closing(self):
+        return self.closing
+
+    def close(self):
+        self.closing = True
+
+    def get_write_buffer_size(self):
+        return self.buffered
+
+    def get_write_buffer_limits(self):
+        return 16384, 65536
+
+    def writelines(self, data):
+        self.written.extend(data)
+
+    async def drain(self):
+        await self.drained.wait()
+
+
+def test_frame_writer_follows_transport_high_water_mark():
+    async def run():
+        writer = Writer(buffered=131072)
+        frames = FrameWriter(writer)
+        frames.start()
+
+        frames.send(PackageType.DATA, 1, b"data")
+        await asyncio.sleep(0)
+        paused = not frames.writable.is_set()
+
+        writer.drained.set()
+        await asyncio.sleep(0)
+        resumed = frames.writable.is_set()
+
+        await frames.close()
+        return paused, resumed
+
+    assert asyncio.run(run()) == (True, True)
+
+
+def written_frames(writer: Writer):
+    data = b"".join(bytes(chunk) for chunk in writer.written)
+    frames = []
+    while data:
+        package_type, connection_id, length = HEADER.unpack_from(data)
+        frames.append((package_type, connection_id, data[HEADER.size:HEADER.size + length]))
+        data = data[HEADER.size + length:]
+    return frames
+
+
+def test_frame_writer_sends_priority_frames_ahead_of_queued_data():
+    async def run():
+        writer = Writer()
+        frames = FrameWriter(writer, max_batch_size=1)
+        for connection_id in (1, 2, 3):
+            frames.send(PackageType.DATA, connection_id, b"data")
+        frames.start()
+        await asyncio.sleep(0)
+
+        frames.send(PackageType.WINDOW_UPDATE, 2, b"\x00\x00\x10\x00")
+        frames.send(PackageType.PING, 0)
+        writer.drained.set()
+        await frames.close()
+        return written_frames(writer)
+
+    assert asyncio.run(run()) == [
+        (PackageType.DATA, 1, b"data"),
+        (PackageType.WINDOW_UPDATE, 2, b"\x00\x00\x10\x00"),
+        (PackageType.PING, 0, b""),
+        (PackageType.DATA, 2, b"data"),
+        (PackageType.DATA, 3, b"data"),
+    ]
+
+
+def test_frame_writer_blocks_producers_when_queue_is_full():
+    async def run():
+        writer = Writer()
+        frames = FrameWriter(writer, queue_size=2)
+        resumed = []
+        frames.send(PackageType.DATA, 1, b"a")
+        frames.send(PackageType.DATA, 1, b"b")
+        frames.notify_writable(lambda: resumed.append(frames.queue_depth))
+        full = not frames.writable.is_set()
+
+        writer.drained.set()
+        frames.start()
+        await frames.close()
+        return full, resumed, [payload for _, _, payload in written_frames(writer)]
+
+    assert asyncio.run(run()) == (True, [0], [b"a", b"b"])
+
+
+def test_frame_writer_flushes_queue_on_close_and_rejects_later_frames():
+    async def run():
+        writer = Writer()
+        writer.drained.set()
+        frames = FrameWriter(writer)
+        frames.start()
+        frames.send(PackageType.DATA, 1, b"last")
+        frames.send(PackageType.CLOSE, 1)
+        await frames.close()
+        return frames.task.done(), frames.send(PackageType.DATA, 1, b"late"), written_frames(writer)
+
+    assert asyncio.run(run()) == (True, False, [(PackageType.DATA, 1, b"last"), (PackageType.CLOSE, 1, b"")])
+
+
+def test_frame_writer_closes_transport_when_drain_times_out():
+    async def run():
+        writer = Writer()
+        frames = FrameWriter(writer, write_timeout=0.01)
+        resumed = []
+        frames.notify_writable(lambda: resumed.append(True))
+        frames.start()
+        frames.send(PackageType.DATA, 1, b"stuck")
+        await frames.task
+        return writer.closing, frames.closed, frames.queue_depth, resumed, frames.send(PackageType.DATA, 1, b"late")
+
+    assert asyncio.run(run()) == (True, True, 0, [True], False)
@@ -0,0 +1,143 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+
+from config.config import load_config
+from metrics.registry import MetricsRegistry
+from ports.pool import PortPool
+from protocol.tunnel_protocol import AuthFlag, AuthStatus, AuthenticationError, Capability, PackageType, client_handshake, client_join, unpack_new_connection, unpack_package, unpack_session, SESSION_TOKEN_SIZE
+from server.handler import SERVER_CAPABILITIES, TunnelClientHandler
+from server.timeouts import TimeoutWheel
+
+ALL_CAPABILITIES = Capability.WINDOWING | Capability.BATCHING | Capability.COMPRESSION | Capability.BINDINGS | Capability.STRIPING | Capability.RESUMPTION
+
+
+@pytest.fixture
+def config(tmp_path):
+    def load(**sections):
+        settings = {"host": "127.0.0.1", "allowed_port_range": [47000, 47999], "accounts": [{"login": "nigarok", "password": "secret"}], "limits": {"max_lanes": 2}}
+        settings.update(sections)
+        path = tmp_path / "config.json"
+        path.write_text(json.dumps(settings))
+        return load_config(str(path))
+    return load
+
+
+@asynccontextmanager
+async def serve(config):
+    clients, clients_lock, tasks = {}, asyncio.Lock(), []
+    port_pool = PortPool(config["allowed_port_range"])
+    timeouts = TimeoutWheel()
+    metrics = MetricsRegistry(port_pool)
+
+    async def handle(reader, writer):
+        tasks.append(asyncio.current_task())
+        await TunnelClientHandler(reader, writer, config, clients_lock, clients, port_pool, timeouts, metrics).listen_loop()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    connections = []
+
+    async def connect():
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+        connections.append(writer)
+        return reader, writer
+
+    try:
+        yield connect
+    finally:
+        for writer in connections:
+            writer.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        server.close()
+        await server.wait_closed()
+
+
+def test_handshake_negotiates_common_capabilities(config):
+    async def run():
+        async with serve(config()) as connect:
+            reader, writer = await connect()
+            version, capabilities, max_frame_size = await client_handshake(reader, writer, "nigarok", "secret", ALL_CAPABILITIES | Capability(0x4000), 32768)
+            package_type, _, payload = await unpack_package(reader)
+            return version, capabilities, max_frame_size, package_type, unpack_new_connection(payload)
+
+    version, capabilities, max_frame_size, package_type, (port, binding) = asyncio.run(run())
+    assert version == 1
+    assert capabilities == ALL_CAPABILITIES & (SERVER_CAPABILITIES | Capability.COMPRESSION)
+    assert max_frame_size == 32768
+    assert package_type == PackageType.NEW_CONNECTION
+    assert 47000 <= port <= 47999 and binding == 0
+
+def test_handshake_drops_capabilities_the_server_disables(config):
+    async def run(settings, requested, max_frame_size):
+        async with serve(settings) as connect:
+            reader, writer = await connect()
+            return (await client_handshake(reader, writer, "nigarok", "secret", requested, max_frame_size))[1:]
+
+    disabled = config(compression={"enabled": False}, sessions={"resumable": False})
+    assert asyncio.run(run(disabled, ALL_CAPABILITIES, 65536)) == (ALL_CAPABILITIES & ~(Capability.COMPRESSION | Capability.RESUMPTION), 65536)
+    assert asyncio.run(run(config(), Capability.RESUMPTION | Capability.COMPRESSION, 512)) == (Capability.NONE, 512)
+
+def test_handshake_rejects_invalid_credentials(config):
+    async def run():
+        async with serve(config()) as connect:
+            reader, writer = await connect()
+            with pytest.raises(AuthenticationError) as error:
+                await client_handshake(reader, writer, "nigarok", "wrong", ALL_CAPABILITIES)
+            return error.value.status
+
+    assert asyncio.run(run()) == AuthStatus.INVALID_CREDENTIALS
+
+def test_handshake_test_flag_checks_credentials_only(config):
+    async def run():
+        async with serve(config()) as connect:
+            reader, writer = await connect()
+            await client_handshake(reader, writer, "nigarok", "secret", ALL_CAPABILITIES, flags=AuthFlag.TEST)
+            return await reader.read()
+
+    assert asyncio.run(run()) == b""
+
+def test_legacy_client_falls_back_to_text_authentication(config):
+    async def run():
+        async with serve(config()) as connect:
+            reader, writer = await connect()
+            writer.write(b"nigarok:secret")
+            package_type, _, payload = await unpack_package(reader)
+
+            test_reader, test_writer = await connect()
+            test_writer.write(b"__test__:nigarok:secret")
+            return package_type, payload, await test_reader.read()
+
+    package_type, payload, test_reply = asyncio.run(run())
+    assert package_type == PackageType.NEW_CONNECTION
+    assert len(payload) == 4 and 47000 <= unpack_new_connection(payload)[0] <= 47999
+    assert test_reply == b"OK"
+
+def test_lane_join_with_unknown_token_is_rejected(config):
+    async def run():
+        async with serve(config()) as connect:
+            reader, writer = await connect()
+            with pytest.raises(AuthenticationError) as error:
+                await client_join(reader, writer, bytes(SESSION_TOKEN_SIZE), ALL_CAPABILITIES)
+            return error.value.status, str(error.value)
+
+    assert asyncio.run(run()) == (AuthStatus.UNAVAILABLE, "Unknown session")
+
+def test_lane_join_is_limited_to_max_lanes(config):
+    async def run():
+        async with serve(config()) as connect:
+            reader, writer = await connect()
+            await client_handshake(reader, writer, "nigarok", "secret", ALL_CAPABILITIES)
+            await unpack_package(reader)
+            package_type, _, payload = await unpack_package(reader)
+            max_lanes, token = unpack_session(payload)
+
+            await client_join(*await connect(), token, ALL_CAPABILITIES)
+            with pytest.raises(AuthenticationError) as error:
+                await client_join(*await connect(), token, ALL_CAPABILITIES)
+            return package_type, max_lanes, error.value.status
+
+    assert asyncio.run(run()) == (PackageType.SESSION, 2, AuthStatus.UNAVAILABLE)
@@ -0,0 +1,32 @@
+import logging
+
+from protocol.tunnel_protocol import RateLimitFilter
+
+
+def record(level: int, sampled: bool, message: str = "Connection %s|%s closed.") -> logging.LogRecord:
+    entry = logging.LogRecord("handler", level, __file__, 1, message, ("login", 1), None)
+    if sampled:
+        entry.sampled = True
+    return entry
+
+
+def test_sampled_info_records_are_limited():
+    limiter = RateLimitFilter(rate=0.001, burst=3)
+    passed = [limiter.filter(record(logging.INFO, True)) for _ in range(10)]
+    assert passed == [True] * 3 + [False] * 7
+
+def test_warnings_and_unmarked_records_always_pass():
+    limiter = RateLimitFilter(rate=0.001, burst=1)
+    assert all(limiter.filter(record(logging.WARNING, True, "Protocol violation on %s|%s")) for _ in range(10))
+    assert all(limiter.filter(record(logging.ERROR, False, "Unexpected error in forward_data for %s|%s")) for _ in range(10))
+    assert all(limiter.filter(record(logging.INFO, False)) for _ in range(10))
+
+def test_suppressed_count_is_reported():
+    limiter = RateLimitFilter(rate=0.001, burst=1)
+    for _ in range(5):
+        limiter.filter(record(logging.INFO, True))
+
+    limiter.buckets["Connection %s|%s closed."][0] = 1.0
+    entry = record(logging.INFO, True)
+    assert limiter.filter(entry)
+    assert entry.getMessage() == "Connection login|1 closed. (4 similar messages suppressed)"
@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ports import allocator
+from ports.allocator import PortAllocator
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(allocator, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_released_port_cools_down_before_reuse(clock):
+    ports = PortAllocator([20000, 20002], cooldown=30.0)
+    first = ports.allocate()
+    ports.release(first)
+
+    assert first not in {ports.allocate(), ports.allocate()}
+    assert ports.stats()["cooling"] == 1
+
+    clock[0] += 30.0
+    ports.reclaim(clock[0])
+    assert ports.stats()["cooling"] == 0
+    assert ports.allocate() == first
+
+def test_cooling_port_is_handed_out_when_nothing_else_is_free(clock):
+    ports = PortAllocator([20000, 20000], cooldown=30.0)
+    port = ports.allocate()
+    ports.release(port)
+
+    assert ports.allocate() == port
+
+def test_login_gets_its_reserved_port_back(clock):
+    ports = PortAllocator([20000, 20009], reservation=300.0)
+    port = ports.allocate("alice")
+    ports.release(port, "alice")
+
+    assert ports.allocate("bob") != port
+    assert ports.allocate("alice") == port
+    assert ports.reuses == 1
+
+def test_new_reservation_replaces_the_previous_one(clock):
+    ports = PortAllocator([20000, 20009], cooldown=30.0, reservation=300.0)
+    first = ports.allocate("alice")
+    second = ports.allocate("alice")
+    ports.release(first, "alice")
+    ports.release(second, "alice")
+
+    assert ports.reservations["alice"][0] == second
+    assert ports.state(first) == allocator.COOLING
+
+def test_reservation_expires(clock):
+    ports = PortAllocator([20000, 20009], reservation=300.0)
+    port = ports.allocate("alice")
+    ports.release(port, "alice")
+
+    clock[0] += 300.0
+    ports.reclaim(clock[0])
+    assert ports.reservations == {}
+    assert ports.state(port) == allocator.FREE
+
+def test_exhaustion_takes_reserved_ports_then_raises(clock):
+    ports = PortAllocator([20000, 20001], reservation=300.0)
+    first = ports.allocate("alice")
+    ports.allocate("bob")
+    ports.release(first, "alice")
+
+    assert ports.allocate("carol") == first
+    with pytest.raises(RuntimeError):
+        ports.allocate("alice")
+    assert ports.exhaustions == 1
+    assert ports.stats()["utilization"] == 1.0
+
+def test_release_ignores_unknown_ports_and_counts_failures(clock):
+    ports = PortAllocator([20000, 20001])
+    port = ports.allocate()
+    ports.release(19999)
+    ports.release(port, failed=True)
+    ports.release(port)
+
+    assert ports.releases == 1
+    assert ports.failures == 1
+    assert ports.used == 0
@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import pytest
+
+from protocol.tunnel_protocol import FlowWindow, PackageType, ProtocolError, ReplayBuffer, ResumeFlag, StreamCompressor, StreamDecompressor, pack_package, pack_resume, unpack_resume, resume_entries, resume_streams, SESSION_TOKEN_SIZE
+
+
+def stream(received: int) -> SimpleNamespace:
+    return SimpleNamespace(receive_window=SimpleNamespace(received_total=received, granted_total=received + 1024))
+
+
+def test_resume_entries_fit_one_frame():
+    streams = {connection_id: stream(connection_id) for connection_id in range(1, 5001)}
+    lingering = {connection_id: None for connection_id in range(5001, 5101)}
+    token = bytes(SESSION_TOKEN_SIZE)
+
+    entries = resume_entries(streams, lingering, 65536)
+    pack_package(PackageType.RESUME, 0, pack_resume(token, entries), max_payload_size=65536)
+
+    assert 3000 < len(entries) < 5000
+    assert list(entries) == list(range(1, len(entries) + 1))
+    assert unpack_resume(pack_resume(token, entries))[1][1] == (ResumeFlag.NONE, 1, 1025)
+
+def test_resume_entries_keep_lingering_streams_when_room():
+    entries = resume_entries({1: stream(10)}, {2: None}, 65536)
+    assert entries == {1: (ResumeFlag.NONE, 10, 1034), 2: (ResumeFlag.CLOSING, 0, 0)}
+
+def test_replay_buffer_retransmits_unacknowledged_bytes_in_chunks():
+    replay = ReplayBuffer()
+    replay.append(b"a" * 100)
+    replay.append(b"b" * 50)
+    sent = []
+
+    credit = replay.retransmit(30, 230, 40, sent.append)
+
+    assert [bytes(piece) for piece in sent] == [b"a" * 40, b"a" * 30, b"b" * 40, b"b" * 10]
+    assert credit == 200 - 120
+    assert (replay.start, replay.end) == (30, 150)
+
+def test_replay_buffer_rejects_resume_outside_its_range():
+    replay = ReplayBuffer()
+    replay.append(b"data")
+
+    with pytest.raises(ProtocolError):
+        replay.retransmit(5, 10, 1024, lambda piece: None)
+
+def test_resume_streams_retransmits_and_finishes_unknown_streams():
+    class Lane:
+        def __init__(self):
+            self.frames = []
+
+        def send(self, package_type, connection_id, payload=b""):
+            self.frames.append((package_type, connection_id, bytes(payload)))
+            return True
+
+    resumed = SimpleNamespace(replay=ReplayBuffer(), send_window=FlowWindow(), compressor=StreamCompressor(), decompressor=StreamDecompressor(), lane=None)
+    resumed.replay.append(b"resumed")
+    dropped = SimpleNamespace(finish=lambda: finished.append(True))
+    finished = []
+    lingering_replay = ReplayBuffer()
+    lingering_replay.append(b"tail")
+    lingering = {3: (0.0, lingering_replay), 4: (0.0, ReplayBuffer())}
+    streams = {1: resumed, 2: dropped}
+    entries = {1: (ResumeFlag.NONE, 0, 1000), 3: (ResumeFlag.NONE, 0, 1000), 4: (ResumeFlag.CLOSING, 0, 0)}
+    lane = Lane()
+    compressor = StreamCompressor()
+
+    resume_streams(streams, lingering, entries, {1: None, 2: None, 3: None, 4: None}, lane, 65536, lambda: compressor)
+
+    assert lane.frames == [(PackageType.DATA, 1, b"resumed"), (PackageType.DATA, 3, b"tail"), (PackageType.CLOSE, 3, b"")]
+    assert finished == [True]
+    assert resumed.lane is lane and resumed.compressor is compressor and resumed.decompressor is None
+    assert resumed.send_window.credit == 1000 - len(b"resumed")
+    assert lingering == {}
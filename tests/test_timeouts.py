@@ -0,0 +1,30 @@
+from server.timeouts import TimeoutWheel
+
+
+def advance(wheel: TimeoutWheel, seconds: int) -> None:
+    for _ in range(seconds):
+        wheel.now += wheel.resolution
+        wheel.tick += 1
+        wheel.expire(wheel.slots[wheel.tick % len(wheel.slots)])
+
+
+def test_timeout_is_read_when_the_timer_comes_due():
+    config = {"connection": 5.0}
+    fired = []
+    wheel = TimeoutWheel()
+    wheel.register(lambda: config["connection"], lambda: fired.append(wheel.now))
+
+    config["connection"] = 60.0
+    advance(wheel, 30)
+    assert fired == []
+
+    advance(wheel, 40)
+    assert fired == [60.0]
+
+def test_zero_timeout_never_fires():
+    fired = []
+    wheel = TimeoutWheel()
+    wheel.register(lambda: 0, lambda: fired.append(wheel.now))
+
+    advance(wheel, 2000)
+    assert fired == []